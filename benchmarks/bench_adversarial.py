@@ -0,0 +1,109 @@
+"""
+長い文字列や住所ではない文字列を正規化する時間を計測する
+
+使い方:
+    python benchmarks/bench_adversarial.py --endpoint file:///tmp/japanese-addresses-master/api/ja
+
+メールなどから貼り付けられた長い文字列を想定し、入力の長さを4倍ずつ増やしながら正規化の時間を計測する
+（長さの制限は外して計測する）
+すべての長さの計測結果から、両対数での傾き（時間が長さの何乗に比例するか）を最小二乗法で求める
+傾きが --limit を超える入力があれば、終了コード 1 で終了する
+"""
+import argparse
+import math
+import os
+import sys
+import time
+from typing import Callable, Dict, List, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from normalize_japanese_addresses import Normalizer  # noqa: E402
+from normalize_japanese_addresses.normalize import DEFAULT_ENDPOINT  # noqa: E402
+
+# 繰り返しの回数から入力を作る関数
+CASES: Dict[str, Callable[[int], str]] = {
+    "spaces": lambda n: "東京都千代田区 " + "あ " * n,
+    "full-width spaces": lambda n: "東京都　千代田区" + "　　あ" * n,
+    "repeated chome": lambda n: "東京都千代田区一番町" + "1丁目" * n,
+    "chome with spaces": lambda n: "東京 都 " + "千代田 区 1 丁目 " * n,
+    "hyphens": lambda n: "東京都千代田区一番町" + "1ー" * n,
+    "hyphens only": lambda n: "ー－─" * n,
+    "digits": lambda n: "東京都千代田区一番町" + "1" * n + "x",
+    "kanji numerals": lambda n: "東京都千代田区一番町" + "一十" * n + "x",
+    "banchi": lambda n: "東京都千代田区一番町" + "1番地" * n,
+    "gun and city": lambda n: "北海道" + "郡 市 " * n + "町",
+    "kyoto": lambda n: "京都府京都市中京区" + "通" * n + "x",
+    "garbage": lambda n: "いろはにほへと" * n,
+    "mojibake": lambda n: "ç¸¦æ\x9b¸ã\x81\x8d" * n,
+}
+
+
+def measure(normalizer: Normalizer, address: str, repeat: int, min_time: float) -> float:
+    """
+    1回の正規化の時間を返す
+    計測の誤差を抑えるため、合計が min_time 秒以上になるまで繰り返し、repeat 回のうち最短の時間を使う
+    """
+    elapsed = []
+    for _ in range(repeat):
+        count = 0
+        started = time.perf_counter()
+        while True:
+            normalizer.normalize(address)
+            count += 1
+            seconds = time.perf_counter() - started
+            if seconds >= min_time:
+                break
+        elapsed.append(seconds / count)
+    return min(elapsed)
+
+
+def fit_slope(results: List[Tuple[int, float]]) -> float:
+    """
+    log(時間) = 傾き * log(長さ) + 切片 の傾きを最小二乗法で求める
+    """
+    xs = [math.log(length) for length, _ in results]
+    ys = [math.log(seconds) for _, seconds in results]
+    x_mean = sum(xs) / len(xs)
+    y_mean = sum(ys) / len(ys)
+    return sum((x - x_mean) * (y - y_mean) for x, y in zip(xs, ys)) / sum((x - x_mean) ** 2 for x in xs)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--endpoint", default=DEFAULT_ENDPOINT)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 400, 1600, 6400])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--min-time", type=float, default=0.05, help="1つの長さを計測する最短の時間（秒）")
+    parser.add_argument("--limit", type=float, default=1.5, help="許容する両対数での傾き（1 で長さに比例、2 で2乗に比例）")
+    args = parser.parse_args()
+
+    normalizer = Normalizer(endpoint=args.endpoint, max_length=None)
+    # 都道府県・市区町村の辞書と、使う町丁目データを読み込んでおく
+    for make in CASES.values():
+        normalizer.normalize(make(1))
+
+    failed = []
+    for name, make in CASES.items():
+        results = []
+        for size in args.sizes:
+            address = make(size)
+            results.append((len(address), measure(normalizer, address, args.repeat, args.min_time)))
+
+        slope = fit_slope(results)
+        superlinear = slope > args.limit
+        if superlinear:
+            failed.append(name)
+        print(
+            f"{name:>18}: "
+            + " ".join(f"{length:>6}:{seconds * 1000:8.3f}ms" for length, seconds in results)
+            + f"  slope {slope:.2f}{'  SUPERLINEAR' if superlinear else ''}"
+        )
+
+    if failed:
+        print(f"superlinear: {', '.join(failed)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+normalize を住所ごとに呼び出す場合と、normalize_many で一括正規化する場合のスループットを比較する
+
+使い方:
+    python benchmarks/bench_batch.py --repeat 10 --endpoint file:///tmp/japanese-addresses-master/api/ja
+
+住所の重複がない場合（--repeat 1）と、同じ住所を繰り返す場合の両方を計測する
+"""
+import argparse
+import csv
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from normalize_japanese_addresses import normalize, normalize_many  # noqa: E402
+from normalize_japanese_addresses.normalize import DEFAULT_ENDPOINT  # noqa: E402
+
+CSV_PATH = os.path.join(os.path.dirname(__file__), "..", "csv", "addresses.csv")
+
+
+def load_addresses(path: str) -> list:
+    with open(path, encoding="utf-8") as fp:
+        return [row["住所"] for row in csv.DictReader(fp)]
+
+
+def measure(addresses: list, endpoint: str) -> None:
+    start = time.perf_counter()
+    expected = [normalize(address, endpoint=endpoint) for address in addresses]
+    loop = time.perf_counter() - start
+
+    start = time.perf_counter()
+    results = normalize_many(addresses, endpoint=endpoint)
+    batch = time.perf_counter() - start
+
+    assert results == expected
+    print(
+        f"{len(addresses):>8} addresses ({len(set(addresses))} unique): "
+        f"loop {len(addresses) / loop:8.0f} addr/s, "
+        f"normalize_many {len(addresses) / batch:8.0f} addr/s, x{loop / batch:.2f}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--csv", default=CSV_PATH, help="住所の列を持つCSV")
+    parser.add_argument("--repeat", type=int, default=10, help="住所を繰り返す回数")
+    parser.add_argument("--endpoint", default=DEFAULT_ENDPOINT)
+    args = parser.parse_args()
+
+    addresses = load_addresses(args.csv)
+
+    # 辞書の読み込みは計測に含めない
+    normalize_many(addresses, endpoint=args.endpoint)
+
+    measure(addresses, args.endpoint)
+    measure(addresses * args.repeat, args.endpoint)
+
+
+if __name__ == "__main__":
+    main()
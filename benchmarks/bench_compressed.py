@@ -0,0 +1,72 @@
+"""
+圧縮していない住所データと、gzip / zstd で圧縮した住所データの読み込み時間を比較する
+
+使い方:
+    python benchmarks/bench_compressed.py /tmp/japanese-addresses-master/api --repeat 5 --workers 8
+
+指定した api ディレクトリを一時ディレクトリにコピー・圧縮し、それぞれ新しい Normalizer で
+すべての市区町村を読み込む時間を計測する
+（OSのページキャッシュは消さないため、ネットワーク越しのボリュームでは差がさらに大きくなる）
+"""
+import argparse
+import gzip
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from normalize_japanese_addresses import Normalizer  # noqa: E402
+from normalize_japanese_addresses.library.api import zstandard  # noqa: E402
+
+
+def copy_tree(source: Path, target: Path, compress=None, suffix: str = "") -> int:
+    """
+    住所データをコピー（圧縮）し、ファイルサイズの合計を返す
+    """
+    size = 0
+    for path in source.rglob("*.json"):
+        output = target / path.relative_to(source)
+        output.parent.mkdir(parents=True, exist_ok=True)
+        if compress is None:
+            shutil.copyfile(path, output)
+        else:
+            output = output.with_name(output.name + suffix)
+            output.write_bytes(compress(path.read_bytes()))
+        size += output.stat().st_size
+    return size
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("api", help="japanese-addresses の api ディレクトリ")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    variants = [("json", None, ""), ("gzip", lambda data: gzip.compress(data, 6), ".gz")]
+    if zstandard is not None:
+        variants.append(("zstd", zstandard.ZstdCompressor(level=3).compress, ".zst"))
+    else:
+        print("zstandard is not installed; skipping zstd")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for name, compress, suffix in variants:
+            target = Path(tmp_dir) / name
+            size = copy_tree(Path(args.api), target, compress, suffix)
+
+            elapsed = []
+            for _ in range(args.repeat):
+                normalizer = Normalizer(endpoint=f"file://{target}/ja")
+                elapsed.append(normalizer.preload(workers=args.workers)["seconds"])
+            print(
+                f"{name:>5}: {size / 1024 / 1024:8.1f} MiB "
+                f"median {statistics.median(elapsed):6.2f}s min {min(elapsed):6.2f}s"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+ParallelNormalizer のプロセス数ごとのスループットを計測する
+
+使い方:
+    python benchmarks/bench_parallel.py --repeat 10 --workers 1 2 4 8 16 \
+        --endpoint file:///tmp/japanese-addresses-master/api/ja
+"""
+import argparse
+import csv
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from normalize_japanese_addresses import ParallelNormalizer, normalize_many  # noqa: E402
+from normalize_japanese_addresses.normalize import DEFAULT_ENDPOINT  # noqa: E402
+
+CSV_PATH = os.path.join(os.path.dirname(__file__), "..", "csv", "addresses.csv")
+
+
+def load_addresses(path: str) -> list:
+    with open(path, encoding="utf-8") as fp:
+        return [row["住所"] for row in csv.DictReader(fp)]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--csv", default=CSV_PATH, help="住所の列を持つCSV")
+    parser.add_argument("--repeat", type=int, default=10, help="住所を繰り返す回数")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--chunksize", type=int, default=1000)
+    parser.add_argument("--endpoint", default=DEFAULT_ENDPOINT)
+    args = parser.parse_args()
+
+    addresses = load_addresses(args.csv) * args.repeat
+    print(f"addresses: {len(addresses)}, cpu_count: {os.cpu_count()}")
+
+    # 1プロセスでの一括正規化を基準にする（辞書の読み込みは計測に含めない）
+    normalize_many(set(addresses), endpoint=args.endpoint)
+    start = time.perf_counter()
+    expected = normalize_many(addresses, endpoint=args.endpoint)
+    baseline = time.perf_counter() - start
+    print(f"{'sequential':>10}: {baseline:8.2f}s {len(addresses) / baseline:10.0f} addr/s")
+
+    # 1プロセスでの並列実行を基準にスケーリングを計測する
+    base_elapsed = None
+    for workers in args.workers:
+        with ParallelNormalizer(workers=workers, chunksize=args.chunksize, endpoint=args.endpoint) as normalizer:
+            # ワーカーの起動を計測に含めない
+            normalizer.normalize_many(addresses[: args.chunksize * workers])
+            start = time.perf_counter()
+            results = normalizer.normalize_many(addresses)
+            elapsed = time.perf_counter() - start
+        assert results == expected
+        base_elapsed = base_elapsed or elapsed
+        print(
+            f"{workers:>10}: {elapsed:8.2f}s {len(addresses) / elapsed:10.0f} addr/s "
+            f"scaling x{base_elapsed / elapsed:.2f}"
+        )
+
+if __name__ == "__main__":
+    main()
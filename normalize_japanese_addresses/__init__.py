@@ -1,3 +1,8 @@
-from .normalize import normalize
+from .normalize import normalize, normalize_many, preload, result_cache_info, Normalizer
+from .normalize_async import normalize_async
+from .parallel import ParallelNormalizer
+from .library.api import Transport, set_transport
+from .library.disk_cache import DiskCache
+from .library.regex import set_disk_cache, set_result_cache_size
 
 name = "normalize-japanese-addresses"
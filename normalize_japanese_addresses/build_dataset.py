@@ -0,0 +1,87 @@
+"""
+japanese-addresses の api/ja を1つの住所データファイルにまとめる
+
+$ python -m normalize_japanese_addresses.build_dataset /tmp/japanese-addresses-master/api/ja japanese-addresses.dataset
+
+作成したファイルは endpoint に dataset:// 形式で指定して利用する
+normalize("...", endpoint="dataset:///path/to/japanese-addresses.dataset")
+"""
+import argparse
+import hashlib
+import os
+import time
+
+from .library.api import api_fetch
+from .library.dataset import encode_city, write_dataset
+from .library.regex import (
+    DatasetCache,
+    get_prefectures_url,
+    get_towns_url,
+    get_prefectures,
+    load_prefectures,
+    load_towns,
+    get_city_entries,
+    get_town_entries,
+)
+
+
+def build_dataset(source: str, output: str) -> dict:
+    """
+    住所データファイルを作成する
+    :param source: api/ja のパス、または endpoint（file:// 形式など）
+    :param output: 作成するファイルのパス
+    :return: 都道府県・市区町村・町丁目の件数とファイルのサイズ
+    """
+    endpoint = source if "://" in source else f"file://{os.path.abspath(source)}"
+
+    # 作成中のデータで既定のキャッシュを使わないよう、専用のキャッシュを使う
+    cache = DatasetCache(maxsize=1)
+    digest = hashlib.sha256()
+
+    text = api_fetch(get_prefectures_url(endpoint)).text
+    digest.update(text.encode("utf-8"))
+    load_prefectures(endpoint, text, cache)
+    prefectures = get_prefectures(endpoint, cache)
+
+    # 市区町村の正規表現は都道府県ごとに名前の長さ順に並べ替えて作成される
+    city_entries = [
+        (pref, city, reg.pattern, keys, exact)
+        for pref, city, reg, keys, exact in get_city_entries(prefectures, cache)
+    ]
+
+    city_blocks = []
+    town_count = 0
+    for pref, cities in prefectures.items():
+        for city in cities:
+            text = api_fetch(get_towns_url(pref, city, endpoint)).text
+            digest.update(text.encode("utf-8"))
+            towns = load_towns(pref, city, endpoint, text, cache)
+            entries = get_town_entries(pref, city, endpoint, cache)
+            city_blocks.append((pref, city, encode_city(towns, entries)))
+            town_count += len(towns)
+
+    size = write_dataset(output, prefectures, city_entries, city_blocks, digest.hexdigest()[:16])
+    return {
+        "prefectures": len(prefectures),
+        "cities": len(city_blocks),
+        "towns": town_count,
+        "size": size,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("source", help="api/ja のパス、または endpoint")
+    parser.add_argument("output", help="作成する住所データファイルのパス")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    stats = build_dataset(args.source, args.output)
+    print(
+        "{prefectures} prefectures, {cities} cities, {towns} towns, {size:,} bytes".format(**stats),
+        f"in {time.perf_counter() - started:.1f}s",
+    )
+
+
+if __name__ == "__main__":
+    main()
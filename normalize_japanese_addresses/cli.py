@@ -0,0 +1,244 @@
+"""
+CSV・JSONL ファイルの住所を正規化する
+
+$ python -m normalize_japanese_addresses addresses.csv -c 住所 -j 4 -o normalized.csv
+$ cat addresses.jsonl | python -m normalize_japanese_addresses - --format jsonl -c address
+
+入力の各行に pref, city, town, addr, lat, lng, level の列を追加して、入力順に出力する
+ファイルは少しずつ読み込むため、大量の行でもメモリ使用量は一定になる
+"""
+import argparse
+import contextlib
+import csv
+import itertools
+import json
+import os
+import sys
+import time
+from typing import ContextManager, Iterator, List, Optional, TextIO, Tuple
+
+from cachetools import LRUCache
+
+from .normalize import Normalizer, DEFAULT_ENDPOINT, DEFAULT_LEVEL
+from .parallel import ParallelNormalizer, DEFAULT_CHUNKSIZE
+
+# 出力に追加する列
+RESULT_COLUMNS = ["pref", "city", "town", "addr", "lat", "lng", "level"]
+
+# 正規化した結果を使い回す住所の件数
+DEFAULT_CACHE_SIZE = 100000
+
+
+class ColumnNotFoundError(ValueError):
+    """
+    住所の列が入力にない
+    """
+
+
+class Stats:
+    """
+    処理した行数・住所の正規化結果を使い回した件数と、スループットを記録する
+    """
+
+    def __init__(self, output: Optional[TextIO], interval: float):
+        self.output = output
+        self.interval = interval
+        self.rows = 0
+        self.hits = 0
+        self.started = time.perf_counter()
+        self.reported = self.started
+
+    def add(self, rows: int, hits: int) -> None:
+        self.rows += rows
+        self.hits += hits
+        now = time.perf_counter()
+        if self.interval > 0 and now - self.reported >= self.interval:
+            self.reported = now
+            self.report()
+
+    def report(self) -> None:
+        if self.output is None:
+            return
+        elapsed = time.perf_counter() - self.started
+        print(
+            f"{self.rows:,} rows in {elapsed:.1f}s "
+            f"({self.rows / elapsed if elapsed > 0 else 0:,.0f} addr/s, "
+            f"cache hit rate {self.hits / self.rows if self.rows > 0 else 0:.1%})",
+            file=self.output,
+            flush=True,
+        )
+
+
+def detect_format(path: str) -> str:
+    return "jsonl" if path.endswith((".jsonl", ".ndjson")) else "csv"
+
+
+def read_rows(fp: TextIO, file_format: str, column: str) -> Tuple[List[str], Iterator[Tuple[dict, str]]]:
+    """
+    入力の列名と、行と住所を順に返すイテレーターを返す
+    """
+    if file_format == "jsonl":
+
+        def iter_jsonl() -> Iterator[Tuple[dict, str]]:
+            for line_number, line in enumerate(fp, 1):
+                if line.strip() == "":
+                    continue
+                row = json.loads(line)
+                if column not in row:
+                    raise ColumnNotFoundError(f"Column {column!r} is not found in line {line_number}")
+                yield row, row[column] or ""
+
+        return [], iter_jsonl()
+
+    reader = csv.DictReader(fp)
+    fieldnames = list(reader.fieldnames or [])
+    if column not in fieldnames:
+        raise ColumnNotFoundError(f"Column {column!r} is not found in the header: {', '.join(fieldnames)}")
+    return fieldnames, ((row, row[column] or "") for row in reader)
+
+
+def normalize_rows(
+    rows: Iterator[Tuple[dict, str]],
+    normalizer,
+    batch_size: int,
+    cache: Optional[LRUCache],
+    stats: Stats,
+) -> Iterator[dict]:
+    """
+    行の住所を正規化し、正規化した結果を追加した行を入力順に返す
+    行は batch_size 件ずつ読み込み、まだ正規化していない住所だけをまとめて正規化する
+    cache が None の場合は、同じまとまりの中の同じ住所だけを使い回す
+    """
+    while True:
+        batch = list(itertools.islice(rows, batch_size))
+        if len(batch) == 0:
+            return
+
+        results = {}
+        hits = 0
+        for _, address in batch:
+            if address in results:
+                hits += 1
+                continue
+            result = cache.get(address) if cache is not None else None
+            if result is not None:
+                hits += 1
+            results[address] = result
+
+        addresses = [address for address, result in results.items() if result is None]
+        for address, result in zip(addresses, normalizer.normalize_many(addresses)):
+            results[address] = result
+            if cache is not None:
+                cache[address] = result
+
+        for row, address in batch:
+            yield {**row, **results[address]}
+        stats.add(len(batch), hits)
+
+
+def open_input(path: str, encoding: str) -> ContextManager[TextIO]:
+    if path == "-":
+        sys.stdin.reconfigure(encoding=encoding, newline="")
+        return contextlib.nullcontext(sys.stdin)
+    return open(path, encoding=encoding, newline="")
+
+
+def open_output(path: Optional[str]) -> ContextManager[TextIO]:
+    if path is None or path == "-":
+        sys.stdout.reconfigure(encoding="utf-8", newline="")
+        return contextlib.nullcontext(sys.stdout)
+    return open(path, "w", encoding="utf-8", newline="")
+
+
+def run(args: argparse.Namespace) -> Stats:
+    file_format = args.format or detect_format(args.input)
+    stats = Stats(None if args.quiet else sys.stderr, args.stats_interval)
+    cache = LRUCache(maxsize=args.cache_size) if args.cache_size > 0 else None
+    max_length = args.max_length or None
+
+    if args.jobs > 1:
+        normalizer = ParallelNormalizer(
+            workers=args.jobs,
+            chunksize=args.chunksize,
+            endpoint=args.endpoint,
+            level=args.level,
+            max_length=max_length,
+        )
+        # 各プロセスに chunksize 件ずつ渡せるように読み込む
+        batch_size = args.chunksize * args.jobs * 2
+    else:
+        normalizer = Normalizer(endpoint=args.endpoint, level=args.level, max_length=max_length)
+        batch_size = args.chunksize
+
+    try:
+        with open_input(args.input, args.encoding) as input_fp, open_output(args.output) as output_fp:
+            fieldnames, rows = read_rows(input_fp, file_format, args.column)
+            results = normalize_rows(rows, normalizer, batch_size, cache, stats)
+
+            if file_format == "jsonl":
+                for row in results:
+                    output_fp.write(json.dumps(row, ensure_ascii=False))
+                    output_fp.write("\n")
+            else:
+                columns = fieldnames + [column for column in RESULT_COLUMNS if column not in fieldnames]
+                writer = csv.DictWriter(output_fp, fieldnames=columns, lineterminator="\n")
+                writer.writeheader()
+                writer.writerows(results)
+    finally:
+        if isinstance(normalizer, ParallelNormalizer):
+            normalizer.close()
+
+    stats.report()
+    return stats
+
+
+def non_negative_int(value: str) -> int:
+    number = int(value)
+    if number < 0:
+        raise argparse.ArgumentTypeError(f"must be 0 or more: {value}")
+    return number
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m normalize_japanese_addresses",
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("input", help="入力ファイル（- で標準入力）")
+    parser.add_argument("-o", "--output", help="出力ファイル（省略時は標準出力）")
+    parser.add_argument("-c", "--column", default="住所", help="住所の列名（JSONL の場合はキー）")
+    parser.add_argument("-j", "--jobs", type=int, default=1, help="プロセス数")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="入力・出力の形式（省略時は拡張子で判定）")
+    parser.add_argument("--encoding", default="utf-8-sig", help="入力ファイルの文字コード")
+    parser.add_argument("--endpoint", default=DEFAULT_ENDPOINT, help="住所データのendpoint")
+    parser.add_argument("--level", type=int, default=DEFAULT_LEVEL, help="正規化レベル")
+    parser.add_argument(
+        "--max-length",
+        type=non_negative_int,
+        default=0,
+        help="正規化する住所の最大の長さ（これより長い住所は level 0 で出力する。0 で制限しない）",
+    )
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE, help="一度に正規化する住所の件数")
+    parser.add_argument(
+        "--cache-size",
+        type=non_negative_int,
+        default=DEFAULT_CACHE_SIZE,
+        help="正規化した結果を使い回す住所の件数（0 で使い回さない）",
+    )
+    parser.add_argument("--stats-interval", type=float, default=10.0, help="進捗を表示する間隔（秒、0 で表示しない）")
+    parser.add_argument("-q", "--quiet", action="store_true", help="進捗を表示しない")
+    args = parser.parse_args(argv)
+
+    try:
+        run(args)
+    except ColumnNotFoundError as e:
+        parser.error(str(e))
+    except BrokenPipeError:
+        # head などで出力が閉じられた場合は、終了時にエラーを表示しないよう標準出力を捨てる
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
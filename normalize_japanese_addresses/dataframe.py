@@ -0,0 +1,89 @@
+"""
+pandas の住所の列を正規化する
+
+import normalize_japanese_addresses.dataframe  # Series に address アクセサーを追加する
+df = df.join(df["住所"].address.normalize(workers=4))
+
+同じ住所は1度だけ正規化し、結果を pref, city, town, addr, lat, lng, level の列に展開する
+"""
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from .normalize import get_normalizer
+from .parallel import ParallelNormalizer, DEFAULT_CHUNKSIZE
+
+# 正規化した結果の列と型（文字列の列は pandas の既定の型）
+RESULT_DTYPES = {
+    "pref": None,
+    "city": None,
+    "town": None,
+    "addr": None,
+    "lat": np.float64,
+    "lng": np.float64,
+    "level": np.int8,
+}
+
+
+def normalize_series(
+    series: pd.Series,
+    workers: Optional[int] = None,
+    chunksize: int = DEFAULT_CHUNKSIZE,
+    **kwargs,
+) -> pd.DataFrame:
+    """
+    住所の列を正規化する
+    同じ住所は1度だけ正規化し、結果を元の行に展開する（欠損値は空文字列として正規化する）
+    :param series: 住所の列
+    :param workers: プロセス数（2以上の場合は ParallelNormalizer で正規化する）
+    :param chunksize: 1プロセスに一度に渡す住所の件数
+    :param kwargs: オプション（level:正規化レベル, endpoint, ttl）
+    :return: pref, city, town, addr, lat, lng, level の列を持ち、series と同じインデックスの DataFrame
+    """
+    codes, uniques = pd.factorize(series.fillna("").astype(str))
+    addresses = list(uniques)
+
+    if workers is not None and workers > 1:
+        with ParallelNormalizer(workers=workers, chunksize=chunksize, **kwargs) as normalizer:
+            results = normalizer.normalize_many(addresses)
+    else:
+        results = get_normalizer(kwargs).normalize_many(addresses)
+
+    columns = {}
+    for column, dtype in RESULT_DTYPES.items():
+        if dtype is np.float64:
+            values = np.array(
+                [np.nan if result[column] is None else result[column] for result in results],
+                dtype=dtype,
+            )
+        elif dtype is not None:
+            values = np.array([result[column] for result in results], dtype=dtype)
+        else:
+            values = np.array([result[column] for result in results], dtype=object)
+        columns[column] = pd.Series(values[codes], index=series.index, dtype=dtype)
+
+    return pd.DataFrame(columns, index=series.index)
+
+
+@pd.api.extensions.register_series_accessor("address")
+class AddressAccessor:
+    """
+    Series の住所を正規化するアクセサー
+
+    df["住所"].address.normalize(level=3, workers=4)
+    """
+
+    def __init__(self, series: pd.Series):
+        self.series = series
+
+    def normalize(
+        self,
+        workers: Optional[int] = None,
+        chunksize: int = DEFAULT_CHUNKSIZE,
+        **kwargs,
+    ) -> pd.DataFrame:
+        """
+        住所を正規化する（normalize_series を参照）
+        """
+        return normalize_series(self.series, workers=workers, chunksize=chunksize, **kwargs)
@@ -1,17 +1,157 @@
+import asyncio
+import gzip
+import os
+import threading
 import urllib.parse
+from typing import BinaryIO, Callable, Dict, Optional, Tuple
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
 
-def api_fetch(endpoint: str = '') -> requests.Response:
+
+class Transport:
+    """
+    HTTP の endpoint から住所データを取得する
+    接続はセッションで使い回し、タイムアウト・再試行・同時接続数の上限を設定できる
+    """
+
+    def __init__(
+        self,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 30.0,
+        retries: int = 3,
+        backoff_factor: float = 0.5,
+        max_connections: int = 10,
+    ):
+        """
+        :param connect_timeout: 接続のタイムアウト（秒）
+        :param read_timeout: 読み込みのタイムアウト（秒）
+        :param retries: 接続エラー・タイムアウト・5xx エラーの再試行回数
+        :param backoff_factor: 再試行の待ち時間の係数（backoff_factor * 2 ** (再試行回数 - 1) 秒待つ）
+        :param max_connections: 同時接続数の上限
+        """
+        self.timeout = (connect_timeout, read_timeout)
+        self.semaphore = threading.BoundedSemaphore(max_connections)
+
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=("GET",),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_maxsize=max_connections, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def get(self, url: str, headers: Optional[dict] = None) -> requests.Response:
+        with self.semaphore:
+            return self.session.get(url, headers=headers, timeout=self.timeout)
+
+    def close(self) -> None:
+        self.session.close()
+
+
+default_transport = Transport()
+
+# endpoint ごとの Transport
+transports: Dict[str, Transport] = {}
+transports_lock = threading.Lock()
+
+
+def set_transport(endpoint: str, transport: Optional[Transport]) -> None:
+    """
+    endpoint（およびその配下のURL）の取得に使う Transport を設定する
+    None を指定すると既定の Transport に戻す
+    """
+    with transports_lock:
+        if transport is None:
+            transports.pop(endpoint, None)
+        else:
+            transports[endpoint] = transport
+
+
+def get_transport(url: str) -> Transport:
+    """
+    URLの取得に使う Transport を返す（最も長く一致する endpoint の設定を使う）
+    """
+    with transports_lock:
+        matched = [endpoint for endpoint in transports if url.startswith(endpoint)]
+        if len(matched) == 0:
+            return default_transport
+        return transports[max(matched, key=len)]
+
+
+def open_zstd(fp: BinaryIO) -> BinaryIO:
+    if zstandard is None:
+        raise ImportError(f"zstandard is required to read {fp.name}")
+    return zstandard.ZstdDecompressor().stream_reader(fp)
+
+
+# 圧縮したファイルの拡張子と、展開しながら読み込むファイルを返す関数
+COMPRESSED_SUFFIXES: Tuple[Tuple[str, Callable[[BinaryIO], BinaryIO]], ...] = (
+    (".gz", lambda fp: gzip.GzipFile(fileobj=fp)),
+    (".zst", open_zstd),
+)
+
+
+def find_local_file(filepath: str) -> Tuple[str, Optional[Callable[[BinaryIO], BinaryIO]]]:
+    """
+    ローカルファイルのパスと、展開する関数を返す
+    ファイルがない場合は圧縮したファイル（.gz / .zst）を探す
+    """
+    if not os.path.exists(filepath):
+        for suffix, decompress in COMPRESSED_SUFFIXES:
+            if os.path.exists(filepath + suffix):
+                return filepath + suffix, decompress
+    return filepath, None
+
+
+def api_fetch(endpoint: str = '', headers: Optional[dict] = None) -> requests.Response:
+    """
+    endpoint（http(s):// または file://）のデータを取得する
+    file:// の圧縮したファイル（.gz / .zst）は展開しながら読み込むが、
+    展開したデータはすべてメモリに読み込んでから返す（JSON の読み込みに少しずつ渡すことはしない）
+    """
     if endpoint.startswith('http'):
-        return requests.get(endpoint)
+        return get_transport(endpoint).get(endpoint, headers)
     elif endpoint.startswith('file'):
-        filepath = urllib.parse.unquote(endpoint.replace("file://", ""))
+        filepath, decompress = find_local_file(urllib.parse.unquote(endpoint.replace("file://", "")))
+        res = requests.Response()
         with open(filepath, 'rb') as fp:
-            res = requests.Response()
-            res._content = fp.read()
+            # ファイルの更新日時とサイズを ETag とし、変更がなければ 304 を返す
+            stat = os.fstat(fp.fileno())
+            etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+            res.headers["ETag"] = etag
+            if headers is not None and headers.get("If-None-Match") == etag:
+                res.status_code = 304
+                res._content = b""
+                return res
+            if decompress is None:
+                res._content = fp.read()
+            else:
+                # 圧縮したファイルは、圧縮したデータ全体を読み込まずに展開しながら読み込む
+                with decompress(fp) as stream:
+                    res._content = stream.read()
+            res.encoding = "utf-8"
             res.status_code = 200
             return res
     else:
         raise ValueError("Invalid endpoint type")
+
+
+async def api_fetch_async(endpoint: str = '') -> str:
+    """
+    api_fetch の非同期版（既定の非同期トランスポート）
+    取得はイベントループの既定のスレッドプールで行い、本文を返す
+    """
+    loop = asyncio.get_running_loop()
+    res = await loop.run_in_executor(None, api_fetch, endpoint)
+    return res.text
@@ -0,0 +1,250 @@
+import json
+import math
+import mmap
+import os
+import struct
+import threading
+import urllib.parse
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+# build_dataset で作成する住所データファイルの形式
+#
+# ヘッダー: マジックナンバー, 形式のバージョン, 索引の長さ
+# 索引: UTF-8 の JSON（都道府県・市区町村の一覧、市区町村の正規表現とキー、市区町村ごとのデータの位置）
+# 市区町村ごとのデータ: 町丁目の件数, 照合用データの件数, 緯度・経度（float64）, フラグ,
+#                       町丁目名・小字名・正規表現・キーなどの文字列（UTF-8 を \0 で区切ったもの）
+#
+# 正規表現とキーは作成時のバージョンのライブラリで生成しているため、
+# 生成方法を変更した場合は FORMAT_VERSION を上げてファイルを作り直す
+DATASET_SCHEME = "dataset://"
+MAGIC = b"NJADDSET"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<8sII")
+BLOCK_HEADER = struct.Struct("<II")
+
+# 照合用データのフラグ
+FLAG_ORIGINAL_TOWN = 1
+FLAG_OMIT_AZA = 2
+FLAG_EXACT = 4
+
+SEPARATOR = "\0"
+
+
+def is_dataset_endpoint(endpoint: str) -> bool:
+    return endpoint.startswith(DATASET_SCHEME)
+
+
+def get_dataset_path(endpoint: str) -> str:
+    return urllib.parse.unquote(endpoint[len(DATASET_SCHEME):])
+
+
+def to_float(value: Optional[float]) -> float:
+    return math.nan if value is None else value
+
+
+def from_float(value: float) -> Optional[float]:
+    return None if math.isnan(value) else value
+
+
+def encode_city(towns: list, entries: list) -> bytes:
+    """
+    市区町村の町丁目データと照合用データをバイト列にする
+    """
+    coordinates = array("d")
+    for town in towns:
+        coordinates.append(to_float(town["lat"]))
+        coordinates.append(to_float(town["lng"]))
+    for _, _, lat, lng, _, _, _ in entries:
+        coordinates.append(to_float(lat))
+        coordinates.append(to_float(lng))
+
+    flags = bytearray()
+    strings = [town["town"] for town in towns]
+    strings.extend(town["koaza"] for town in towns)
+    for town, pattern, _, _, key, omit_aza, exact in entries:
+        flag = 0
+        if "originalTown" in town:
+            flag |= FLAG_ORIGINAL_TOWN
+        if omit_aza:
+            flag |= FLAG_OMIT_AZA
+        if exact:
+            flag |= FLAG_EXACT
+        flags.append(flag)
+        strings.extend([town["town"], town.get("originalTown", ""), pattern, key])
+
+    return b"".join(
+        [
+            BLOCK_HEADER.pack(len(towns), len(entries)),
+            coordinates.tobytes(),
+            bytes(flags),
+            SEPARATOR.join(strings).encode("utf-8"),
+        ]
+    )
+
+
+def decode_city(block: bytes) -> Tuple[list, list]:
+    """
+    encode_city で作成したバイト列から、町丁目データと照合用データを復元する
+    """
+    town_count, entry_count = BLOCK_HEADER.unpack_from(block)
+    position = BLOCK_HEADER.size
+
+    coordinates = array("d")
+    coordinates.frombytes(block[position : position + (town_count + entry_count) * 16])
+    position += (town_count + entry_count) * 16
+    flags = block[position : position + entry_count]
+    position += entry_count
+    strings = bytes(block[position:]).decode("utf-8").split(SEPARATOR)
+
+    towns = []
+    for index in range(town_count):
+        towns.append(
+            {
+                "town": strings[index],
+                "koaza": strings[town_count + index],
+                "lat": from_float(coordinates[index * 2]),
+                "lng": from_float(coordinates[index * 2 + 1]),
+            }
+        )
+
+    entries = []
+    position = town_count * 2
+    for index in range(entry_count):
+        name, original_town, pattern, key = strings[position : position + 4]
+        position += 4
+        flag = flags[index]
+        town = {}
+        if flag & FLAG_ORIGINAL_TOWN:
+            town["originalTown"] = original_town
+        town["town"] = name
+        coordinate = (town_count + index) * 2
+        entries.append(
+            (
+                town,
+                pattern,
+                from_float(coordinates[coordinate]),
+                from_float(coordinates[coordinate + 1]),
+                key,
+                bool(flag & FLAG_OMIT_AZA),
+                bool(flag & FLAG_EXACT),
+            )
+        )
+
+    return towns, entries
+
+
+def write_dataset(
+    path: str,
+    prefectures: dict,
+    city_entries: list,
+    city_blocks: List[Tuple[str, str, bytes]],
+    version: str,
+) -> int:
+    """
+    住所データファイルを書き出し、ファイルのサイズを返す
+    """
+    blocks = []
+    offset = 0
+    for pref, city, block in city_blocks:
+        blocks.append([pref, city, offset, len(block)])
+        offset += len(block)
+
+    index = json.dumps(
+        {
+            "version": version,
+            "prefectures": prefectures,
+            "cities": [
+                [pref, city, pattern, keys, exact]
+                for pref, city, pattern, keys, exact in city_entries
+            ],
+            "blocks": blocks,
+        },
+        ensure_ascii=False,
+    ).encode("utf-8")
+
+    # メモリマップで開いているプロセスがあっても壊れないよう、別のファイルに書き出してから置き換える
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, "wb") as fp:
+        fp.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(index)))
+        fp.write(index)
+        for _, _, block in city_blocks:
+            fp.write(block)
+    os.replace(temporary_path, path)
+
+    return HEADER.size + len(index) + offset
+
+
+class Dataset:
+    """
+    build_dataset で作成した住所データファイル
+    ファイルはメモリマップで開き、市区町村の町丁目データは初めて参照したときに復元する
+    （同じファイルを開いた複数のプロセスは、OSのページキャッシュを共有する）
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as fp:
+            self.data = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, format_version, index_size = HEADER.unpack_from(self.data)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"Invalid dataset file: {path}")
+        if format_version != FORMAT_VERSION:
+            self.close()
+            raise ValueError(
+                f"Unsupported dataset format version {format_version} "
+                f"(expected {FORMAT_VERSION}): {path}"
+            )
+
+        index = json.loads(self.data[HEADER.size : HEADER.size + index_size].decode("utf-8"))
+        self.path = path
+        self.version: str = index["version"]
+        self.prefectures: dict = index["prefectures"]
+        self.city_entries = [tuple(entry) for entry in index["cities"]]
+
+        data_start = HEADER.size + index_size
+        self.blocks: Dict[Tuple[str, str], Tuple[int, int]] = {
+            (pref, city): (data_start + offset, length)
+            for pref, city, offset, length in index["blocks"]
+        }
+
+    def close(self) -> None:
+        self.data.close()
+
+    def get_towns(self, pref: str, city: str) -> list:
+        return self.get_city(pref, city)[0]
+
+    def get_city(self, pref: str, city: str) -> Tuple[list, list]:
+        """
+        市区町村の町丁目データと照合用データを復元する
+        復元したデータはキャッシュしないため、呼び出し側でキャッシュする
+        """
+        block = self.blocks.get((pref, city))
+        if block is None:
+            raise KeyError(f"{pref}{city} is not in the dataset: {self.path}")
+        start, length = block
+        return decode_city(self.data[start : start + length])
+
+
+# パスごとの (ファイルの i-node 番号・更新日時・サイズ, 開いた住所データファイル)
+datasets: Dict[str, Tuple[Tuple[int, int, int], Dataset]] = {}
+datasets_lock = threading.Lock()
+
+
+def open_dataset(endpoint: str) -> Dataset:
+    """
+    endpoint（dataset:///path/to/file）の住所データファイルを開く
+    同じファイルは1度だけ読み込み、build_dataset で作り直されたファイルは開き直す
+    古いファイルのメモリマップは、参照されなくなったときに閉じられる
+    """
+    path = get_dataset_path(endpoint)
+    stat = os.stat(path)
+    file_id = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+    with datasets_lock:
+        opened = datasets.get(path)
+        if opened is not None and opened[0] == file_id:
+            return opened[1]
+        dataset = Dataset(path)
+        datasets[path] = (file_id, dataset)
+        return dataset
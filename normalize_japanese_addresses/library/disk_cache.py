@@ -0,0 +1,98 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import NamedTuple, Optional
+
+
+class DiskCacheEntry(NamedTuple):
+    text: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    fetched_at: float
+
+
+class DiskCache:
+    """
+    取得した住所データを保存する SQLite のキャッシュ
+    新しいプロセスでも住所データを取得し直さずに利用できる
+    複数のスレッド・プロセスから同時に読み書きできる（スレッドごとに接続を作成する）
+    """
+
+    def __init__(self, path: str, timeout: float = 30.0):
+        """
+        :param path: SQLite のファイルのパス
+        :param timeout: 他のプロセスが書き込み中の場合に待つ時間（秒）
+        """
+        self.path = path
+        self.timeout = timeout
+        self.local = threading.local()
+        # fork で親プロセスから引き継いだ接続（子プロセスで閉じると親プロセスの WAL を壊すおそれがあるため、閉じずに残しておく）
+        self.inherited_connections = []
+
+        connection = self.connect()
+        with connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "url TEXT PRIMARY KEY, text TEXT NOT NULL, etag TEXT, last_modified TEXT, "
+                "fetched_at REAL NOT NULL)"
+            )
+
+    def connect(self) -> sqlite3.Connection:
+        """
+        スレッドごとの接続を返す
+        fork で作成した子プロセスでは、親プロセスの接続を使わずに新しく接続する
+        （SQLite の接続は fork をまたいで使えないため）
+        """
+        pid = os.getpid()
+        connection = getattr(self.local, "connection", None)
+        if connection is None or self.local.pid != pid:
+            if connection is not None:
+                self.inherited_connections.append(connection)
+            connection = sqlite3.connect(self.path, timeout=self.timeout)
+            # 読み込みと書き込みを同時に行えるようにする
+            connection.execute("PRAGMA journal_mode=WAL")
+            self.local.connection = connection
+            self.local.pid = pid
+        return connection
+
+    def get(self, url: str) -> Optional[DiskCacheEntry]:
+        row = (
+            self.connect()
+            .execute(
+                "SELECT text, etag, last_modified, fetched_at FROM entries WHERE url = ?",
+                (url,),
+            )
+            .fetchone()
+        )
+        return DiskCacheEntry(*row) if row is not None else None
+
+    def set(
+        self,
+        url: str,
+        text: str,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+    ) -> None:
+        connection = self.connect()
+        with connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO entries (url, text, etag, last_modified, fetched_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (url, text, etag, last_modified, time.time()),
+            )
+
+    def touch(self, url: str) -> None:
+        """
+        変更がなかった（304）データの取得日時を更新する
+        """
+        connection = self.connect()
+        with connection:
+            connection.execute(
+                "UPDATE entries SET fetched_at = ? WHERE url = ?", (time.time(), url)
+            )
+
+    def clear(self) -> None:
+        connection = self.connect()
+        with connection:
+            connection.execute("DELETE FROM entries")
@@ -1,10 +1,12 @@
 import re
 import json
+import threading
 import urllib.parse
+from concurrent.futures import Future
 from typing import List, Dict, Any, Optional, Union, Generator, Tuple, Callable, Pattern
 
 import kanjize
-from cachetools import TTLCache
+from cachetools import LRUCache, TTLCache
 import time
 
 import functools
@@ -12,6 +14,9 @@ from functools import wraps
 
 from .api import api_fetch
 from .utils import kan2num, find_kanji_numbers
+from .trie import build_trie, search_prefixes
+from .dataset import is_dataset_endpoint, open_dataset
+from .disk_cache import DiskCache, DiskCacheEntry
 
 JIS_OLD_KANJI = (
     "亞,圍,壹,榮,驛,應,櫻,假,會,懷,覺,樂,陷,歡,氣,戲,據,挾,區,徑,溪,輕,藝,儉,圈,權,嚴,恆,國,齋,雜,蠶,殘,兒,實,釋,從,縱,敍,燒,條,剩,壤,釀,眞,盡,醉,髓,聲,竊,"
@@ -35,77 +40,495 @@ JIS_NEW_KANJI = (
     )
 )
 
-ttl = 60 * 60 * 24 * 7
-cache_prefecture = TTLCache(maxsize=300, ttl=ttl)
-cache_cities = {}
-cache_towns = TTLCache(maxsize=300, ttl=ttl)
+# 以下なるべく文字数が多いものほど上にすること
+TO_REGEX_PATTERNS = [
+    ("三栄町|四谷三栄町", "(三栄町|四谷三栄町)"),
+    ("鬮野川|くじ野川|くじの川", "(鬮野川|くじ野川|くじの川)"),
+    ("通り|とおり", "(通り|とおり)"),
+    ("柿碕町|柿さき町", "(柿碕町|柿さき町)"),
+    ("埠頭|ふ頭", "(埠頭|ふ頭)"),
+    ("番町|番丁", "(番町|番丁)"),
+    ("大冝|大宜", "(大冝|大宜)"),
+    ("穝|さい", "(穝|さい)"),
+    ("杁|えぶり", "(杁|えぶり)"),
+    ("薭|稗|ひえ|ヒエ", "(薭|稗|ひえ|ヒエ)"),
+    ("[之ノの]", "[之ノの]"),
+    ("[ヶケが]", "[ヶケが]"),
+    ("[ヵカか力]", "[ヵカか力]"),
+    ("[ッツっつ]", "[ッツっつ]"),
+    ("[ニ二]", "[ニ二]"),
+    ("[ハ八]", "[ハ八]"),
+    ("[塚塚]", "[塚塚]"),
+    ("[釜竈]", "[釜竈]"),
+    ("[條条]", "[條条]"),
+    ("[狛拍]", "[狛拍]"),
+    ("[藪薮]", "[藪薮]"),
+    ("[渕淵]", "[渕淵]"),
+    ("[エヱえ]", "[エヱえ]"),
+    ("[曾曽]", "[曾曽]"),
+    ("[舟船]", "[舟船]"),
+    ("[莵菟]", "[莵菟]"),
+    ("[市巿]", "[市巿]"),
+]
+
+TO_REGEX_REGEXES = [
+    (re.compile(pattern), "({})".format(pattern)) for pattern, _ in TO_REGEX_PATTERNS
+]
+
+HYPHEN_CHARACTERS = "-－﹣−‐⁃‑‒–—﹘―⎯⏤ーｰ─━"
+HYPHEN_REGEX = f"[{HYPHEN_CHARACTERS}]"
+
+# 町丁目の番号部分（「一丁目」「二条」など）
+CHOME_REGEX = re.compile("([壱一二三四五六七八九十]+)(丁目?|番([町丁])|条|軒|線|([のノ])町|地割)")
+
+# 正規表現の特殊文字
+REGEX_SPECIAL_CHARACTERS = set(".^$*+?{}[]\\|()")
+
+
+def build_fold_table() -> dict:
+    """
+    to_regex などで同一視される文字を1つの代表文字にまとめる変換テーブルを作成する
+    """
+    groups = [HYPHEN_CHARACTERS]
+    groups += [pattern[1:-1] for pattern, _ in TO_REGEX_PATTERNS if pattern.startswith("[")]
+    groups += [old_kanji + new_kanji for old_kanji, new_kanji in zip(JIS_OLD_KANJI, JIS_NEW_KANJI)]
+
+    parents = {}
+
+    def find(char: str) -> str:
+        while parents.setdefault(char, char) != char:
+            char = parents[char]
+        return char
+
+    for group in groups:
+        root = find(group[0])
+        for char in group[1:]:
+            _root = find(char)
+            if _root != root:
+                parents[_root] = root
+
+    return {ord(char): find(char) for char in parents if find(char) != char}
+
+
+FOLD_TABLE = build_fold_table()
+
+# 代表文字ごとの同一視される文字の集合
+FOLD_GROUPS = {}
+for _char_code, _folded_char in FOLD_TABLE.items():
+    FOLD_GROUPS.setdefault(_folded_char, {_folded_char}).add(chr(_char_code))
+
+# to_regexで複数文字の選択肢に置き換えられる文字列
+FOLD_STOP_WORDS = [
+    word
+    for pattern, _ in TO_REGEX_PATTERNS
+    if not pattern.startswith("[")
+    for word in pattern.split("|")
+]
+
+# to_regexの文字クラスにjis_kanji_to_both_formsの置換が入れ子になり、同一視される文字が定まらない文字
+FOLD_STOP_CHARACTERS = REGEX_SPECIAL_CHARACTERS | {
+    char
+    for pattern, _ in TO_REGEX_PATTERNS
+    if pattern.startswith("[") and set(pattern[1:-1]) & set(JIS_OLD_KANJI + JIS_NEW_KANJI)
+    for char in pattern[1:-1]
+}
+
+
+def build_jis_kanji_table() -> dict:
+    """
+    旧字体と新字体の両方にマッチする表現への置換を、1文字ずつ事前に適用した変換テーブルを作成する
+    置換は1文字単位で行われるため、文字列全体への置換と同じ結果になる
+    """
+    table = {}
+    for char in set(JIS_OLD_KANJI + JIS_NEW_KANJI):
+        value = char
+        for old_kanji, new_kanji in zip(JIS_OLD_KANJI, JIS_NEW_KANJI):
+            if old_kanji in value or new_kanji in value:
+                both_forms = f"({old_kanji}|{new_kanji})"
+                value = value.translate({ord(old_kanji): both_forms, ord(new_kanji): both_forms})
+        table[ord(char)] = value
+    return table
+
+
+JIS_KANJI_TABLE = build_jis_kanji_table()
+
+# キャッシュの既定の有効期間（秒）と上限件数
+DEFAULT_TTL = 60 * 60 * 24 * 7
+DEFAULT_CACHE_SIZE = 300
+
+# ttl オプションを指定した呼び出しで使うキャッシュの上限数（古いものから破棄する）
+MAX_TTL_CACHES = 8
+
+
+class DatasetCache:
+    """
+    住所データと、住所データから作成した索引・正規表現のキャッシュ
+    キャッシュの読み書きはロックで保護しているため、複数のスレッドから同時に利用できる
+    """
+
+    def __init__(
+        self,
+        ttl: int = DEFAULT_TTL,
+        maxsize: int = DEFAULT_CACHE_SIZE,
+        disk_cache: Optional[DiskCache] = None,
+        result_cache_size: int = 0,
+    ):
+        self.lock = threading.Lock()
+        # 取得した住所データを保存するディスクキャッシュ（任意）
+        self.disk_cache = disk_cache
+        # 取得中のURLと、その結果を待つための Future
+        self.fetches_in_flight: Dict[str, Future] = {}
+        # 正規化した結果のキャッシュの上限件数（0 の場合はキャッシュしない）
+        self.result_cache_size = result_cache_size
+        # 住所データが変わるたびに増やす番号（正規化した結果のキャッシュのキーに含める）
+        self.version = 0
+        self.reset(ttl, maxsize)
+
+    def reset(self, ttl: Optional[int] = None, maxsize: Optional[int] = None) -> None:
+        """
+        キャッシュを空にする（ttl, maxsize を指定した場合は変更する）
+        """
+        with self.lock:
+            if ttl is not None:
+                self.ttl = ttl
+            if maxsize is not None:
+                self.maxsize = maxsize
+            self.prefectures = TTLCache(maxsize=self.maxsize, ttl=self.ttl)
+            self.towns = TTLCache(maxsize=self.maxsize, ttl=self.ttl)
+            # 都道府県ごとの市区町村の正規表現
+            self.city_regexes = TTLCache(maxsize=self.maxsize, ttl=self.ttl)
+            # 有効期間が過ぎた後に条件付きで取得するため、取得したデータと ETag / Last-Modified を残しておく
+            self.validated = LRUCache(maxsize=self.maxsize)
+            # 索引と正規表現は、作成元のデータが同じオブジェクトである間は作り直さずに使う
+            self.city_indexes = LRUCache(maxsize=self.maxsize)
+            self.town_matchers = LRUCache(maxsize=self.maxsize)
+            # 住所データが変わったかを判定するため、前回読み込んだデータを残しておく
+            self.loaded = LRUCache(maxsize=self.maxsize)
+            self.loaded_keys = set()
+            self.version += 1
+            self.reset_results()
+
+    def reserve(self, count: int) -> None:
+        """
+        count 件のデータを読み込んでも追い出されないよう、上限件数を増やす（減らすことはない）
+        読み込み済みのデータは残す（有効期間は上限件数を増やした時点から数え直す）
+        """
+        with self.lock:
+            if count <= self.maxsize:
+                return
+            self.maxsize = count
+            for name in ("prefectures", "towns", "city_regexes"):
+                cache = TTLCache(maxsize=self.maxsize, ttl=self.ttl)
+                cache.update(getattr(self, name))
+                setattr(self, name, cache)
+            for name in ("validated", "city_indexes", "town_matchers", "loaded"):
+                cache = LRUCache(maxsize=self.maxsize)
+                cache.update(getattr(self, name))
+                setattr(self, name, cache)
+
+    def clear_cities(self) -> None:
+        """
+        市区町村の正規表現と索引を空にする（次に使うときに作り直す）
+        """
+        with self.lock:
+            self.city_regexes.clear()
+            self.city_indexes.clear()
+
+    def reset_results(self) -> None:
+        self.results = (
+            TTLCache(maxsize=self.result_cache_size, ttl=self.ttl)
+            if self.result_cache_size > 0
+            else None
+        )
+        self.result_hits = 0
+        self.result_misses = 0
+
+    def set_result_cache_size(self, result_cache_size: int) -> None:
+        """
+        正規化した結果のキャッシュの上限件数を変更する（0 でキャッシュしない）
+        """
+        with self.lock:
+            self.result_cache_size = result_cache_size
+            self.reset_results()
+
+    def get(self, name: str, key: Any) -> Any:
+        with self.lock:
+            return getattr(self, name).get(key)
+
+    def set(self, name: str, key: Any, value: Any) -> None:
+        with self.lock:
+            if name in ("prefectures", "towns"):
+                self.update_version(key, value)
+            getattr(self, name)[key] = value
+
+    def update_version(self, key: Any, value: Any) -> None:
+        """
+        一度読み込んだ住所データの内容が変わった場合は、住所データの番号を増やす
+        （有効期間が過ぎて読み込み直しても内容が同じであれば、正規化した結果のキャッシュを使い続ける）
+        """
+        if key in self.loaded_keys:
+            loaded = self.loaded.get(key)
+            if loaded is None or (loaded is not value and loaded != value):
+                self.version += 1
+        self.loaded_keys.add(key)
+        self.loaded[key] = value
+
+    def get_result(self, key: Any) -> Optional[dict]:
+        """
+        正規化した結果のキャッシュからコピーを返す
+        キーには住所データの番号（version）を含める
+        """
+        with self.lock:
+            if self.results is None:
+                return None
+            result = self.results.get(key)
+            if result is None:
+                self.result_misses += 1
+                return None
+            self.result_hits += 1
+            return result.copy()
+
+    def set_result(self, key: Any, result: dict) -> None:
+        with self.lock:
+            if self.results is not None:
+                self.results[key] = result.copy()
+
+    def result_cache_info(self) -> dict:
+        """
+        正規化した結果のキャッシュのヒット数・ミス数・件数・上限件数を返す
+        """
+        with self.lock:
+            return {
+                "hits": self.result_hits,
+                "misses": self.result_misses,
+                "size": 0 if self.results is None else len(self.results),
+                "maxsize": self.result_cache_size,
+            }
+
+
+# cache を指定しない場合に使うキャッシュ
+default_cache = DatasetCache()
+
+# ttl オプションを指定した呼び出しで使うキャッシュ（ttlごと）
+ttl_caches: LRUCache = LRUCache(maxsize=MAX_TTL_CACHES)
+ttl_caches_lock = threading.Lock()
 
 
 def set_ttl(ttl_value: int) -> None:
-    global ttl
-    global cache_prefecture
-    global cache_towns
-
-    ttl = ttl_value
-    cache_prefecture = TTLCache(maxsize=300, ttl=ttl)
-    cache_prefecture.clear()
-    cache_towns = TTLCache(maxsize=300, ttl=ttl)
-    cache_towns.clear()
+    default_cache.reset(ttl_value)
+    with ttl_caches_lock:
+        ttl_caches.clear()
     clear_cache_of_cities()
 
+def set_disk_cache(disk_cache: Optional[Union[DiskCache, str]]) -> None:
+    """
+    既定のキャッシュで使うディスクキャッシュを設定する（None で解除）
+    """
+    if isinstance(disk_cache, str):
+        disk_cache = DiskCache(disk_cache)
+    default_cache.disk_cache = disk_cache
+    with ttl_caches_lock:
+        for cache in ttl_caches.values():
+            cache.disk_cache = disk_cache
+
+def set_result_cache_size(result_cache_size: int) -> None:
+    """
+    既定のキャッシュで、正規化した結果をキャッシュする件数を設定する（0 でキャッシュしない）
+    """
+    default_cache.set_result_cache_size(result_cache_size)
+    with ttl_caches_lock:
+        for cache in ttl_caches.values():
+            cache.set_result_cache_size(result_cache_size)
+
 def clear_cache_of_cities() -> None:
-    global cache_cities
-    
-    cache_cities.clear()
-
-def get_prefectures(endpoint: str) -> dict:
-    global cache_prefecture
-    endpoint_url = f"{endpoint}.json"
-    prefectures = cache_prefecture.get(endpoint_url)
-    if prefectures is None:
-        prefectures = json.loads(api_fetch(endpoint_url).text)
-        cache_prefecture[endpoint_url] = prefectures
+    """
+    既定のキャッシュ（と ttl ごとのキャッシュ）の市区町村の正規表現と索引を空にする
+    """
+    default_cache.clear_cities()
+    with ttl_caches_lock:
+        for cache in ttl_caches.values():
+            cache.clear_cities()
+
+def get_ttl_cache(ttl_value: int) -> DatasetCache:
+    """
+    ttl オプションを指定した呼び出しで使うキャッシュを返す
+    既定のキャッシュは置き換えないため、他の呼び出しのキャッシュには影響しない
+    """
+    if ttl_value == default_cache.ttl:
+        return default_cache
+    with ttl_caches_lock:
+        cache = ttl_caches.get(ttl_value)
+        if cache is None:
+            cache = ttl_caches[ttl_value] = DatasetCache(
+                ttl_value,
+                disk_cache=default_cache.disk_cache,
+                result_cache_size=default_cache.result_cache_size,
+            )
+        return cache
+
+
+def fetch_once(
+    key: str, name: str, load: Callable[[], Any], cache: Optional[DatasetCache] = None
+) -> Any:
+    """
+    キャッシュにあるデータを返し、なければ load で読み込んでキャッシュする
+    複数のスレッドが同じデータを同時に読み込もうとした場合は、最初のスレッドだけが読み込み、
+    他のスレッドはその結果を待つ
+    """
+    cache = cache or default_cache
+    with cache.lock:
+        value = getattr(cache, name).get(key)
+        if value is not None:
+            return value
+        future = cache.fetches_in_flight.get(key)
+        if future is not None:
+            leader = False
+        else:
+            leader = True
+            future = cache.fetches_in_flight[key] = Future()
+
+    if not leader:
+        return future.result()
+
+    try:
+        value = load()
+    except BaseException as e:
+        with cache.lock:
+            del cache.fetches_in_flight[key]
+        future.set_exception(e)
+        raise
+
+    with cache.lock:
+        cache.update_version(key, value)
+        getattr(cache, name)[key] = value
+        del cache.fetches_in_flight[key]
+    future.set_result(value)
+    return value
+
+
+def fetch_json(url: str, parse: Callable[[str], Any], cache: Optional[DatasetCache] = None) -> Any:
+    """
+    URLのデータを取得して読み込む
+    前回取得したときの ETag / Last-Modified があれば条件付きで取得し、
+    変更がなければ（304）前回読み込んだデータをそのまま返す
+    ディスクキャッシュを設定している場合は、有効期間内のデータを取得せずに読み込む
+    """
+    cache = cache or default_cache
+    disk_cache = cache.disk_cache
+
+    # 前回読み込んだデータと、その ETag / Last-Modified
+    validated = cache.get("validated", url)
+    validators = validated[1:] if validated is not None else None
+
+    stored = disk_cache.get(url) if disk_cache is not None else None
+    if stored is not None:
+        if validators != (stored.etag, stored.last_modified):
+            # 他のプロセスが更新したデータは、メモリ上のデータより新しい
+            validated = None
+            validators = (stored.etag, stored.last_modified)
+        if time.time() - stored.fetched_at <= cache.ttl:
+            return validated[0] if validated is not None else load_json(url, parse, cache, stored)
+
+    headers = {}
+    if validators is not None:
+        etag, last_modified = validators
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+
+    res = api_fetch(url, headers=headers)
+    if validators is not None and res.status_code == 304:
+        if disk_cache is not None and stored is not None:
+            disk_cache.touch(url)
+        return validated[0] if validated is not None else load_json(url, parse, cache, stored)
+
+    return load_json(url, parse, cache, res, disk_cache)
+
+
+def load_json(
+    url: str,
+    parse: Callable[[str], Any],
+    cache: DatasetCache,
+    source: Any,
+    disk_cache: Optional[DiskCache] = None,
+) -> Any:
+    """
+    レスポンス（またはディスクキャッシュ）の本文を読み込み、ETag / Last-Modified と合わせてキャッシュする
+    """
+    if isinstance(source, DiskCacheEntry):
+        text, etag, last_modified = source.text, source.etag, source.last_modified
+    else:
+        text = source.text
+        etag = source.headers.get("ETag")
+        last_modified = source.headers.get("Last-Modified")
+
+    value = parse(text)
+    if disk_cache is not None:
+        disk_cache.set(url, text, etag, last_modified)
+    if etag or last_modified:
+        cache.set("validated", url, (value, etag, last_modified))
+    return value
+
+
+def get_prefectures_url(endpoint: str) -> str:
+    return f"{endpoint}.json"
+
+
+def load_prefectures(endpoint: str, text: str, cache: Optional[DatasetCache] = None) -> dict:
+    """
+    取得した都道府県データを読み込んでキャッシュする
+    """
+    prefectures = json.loads(text)
+    (cache or default_cache).set("prefectures", get_prefectures_url(endpoint), prefectures)
     return prefectures
 
-def get_prefecture_regexes(prefecture_names: list, omit_mode: bool = False) -> list:
+
+def get_cached_prefectures(endpoint: str, cache: Optional[DatasetCache] = None) -> Optional[dict]:
+    return (cache or default_cache).get("prefectures", get_prefectures_url(endpoint))
+
+
+def get_prefectures(endpoint: str, cache: Optional[DatasetCache] = None) -> dict:
+    if is_dataset_endpoint(endpoint):
+        return open_dataset(endpoint).prefectures
+
+    endpoint_url = get_prefectures_url(endpoint)
+    return fetch_once(
+        endpoint_url, "prefectures", lambda: fetch_json(endpoint_url, json.loads, cache), cache
+    )
+
+def get_prefecture_regex(prefecture_names: list, omit_mode: bool = False) -> Pattern:
+    return compile_prefecture_regex(tuple(prefecture_names), omit_mode)
+
+@functools.lru_cache(maxsize=DEFAULT_CACHE_SIZE)
+def compile_prefecture_regex(prefecture_names: tuple, omit_mode: bool) -> Pattern:
+    # 都道府県ごとの正規表現を1つにまとめ、先頭から順に評価されるようにする
+    # マッチした都道府県は match.lastindex - 1 で prefecture_names から参照できる
     prefecture_regex = "([都道府県])"
+    suffix_regex = "[都道府県]" if not omit_mode else "[都道府県]?"
+    patterns = []
     for prefecture_name in prefecture_names:
         _prefecture_name = re.sub(f"{prefecture_regex}$", "", prefecture_name)
-        reg = (
-            re.compile(f"^{_prefecture_name}{prefecture_regex}")
-            if not omit_mode
-            else re.compile(f"^{_prefecture_name}{prefecture_regex}?")
-        )
-        yield prefecture_name, reg
+        patterns.append(f"({_prefecture_name}){suffix_regex}")
+    return re.compile("^(?:{})".format("|".join(patterns)))
 
-def cities_list_to_tuple(lst) -> tuple:
-    # citiesのリストについては、事前に長さでソートする必要があるためTupleに変換する前に実行する
-    lst.sort(key=len)
-    return tuple(lst)
+def get_city_regexes(pref: str, cities: list, cache: Optional[DatasetCache] = None) -> list:
+    """
+    都道府県の市区町村の正規表現を、市区町村名の長さ順に返す
+    呼び出し元の市区町村のリストは並べ替えない
+    """
+    cache = cache or default_cache
 
+    # 市区町村のリストは、事前に長さでソートする必要があるためTupleに変換する前に実行する
+    key = (pref, tuple(sorted(cities, key=len)))
+    city_regexes = cache.get("city_regexes", key)
+    if city_regexes is None:
+        city_regexes = compile_city_regexes(key[1])
+        cache.set("city_regexes", key, city_regexes)
+    return city_regexes
 
-def cache_cities_with_ttl() -> Callable:
-    global cache_cities
-    
-    def decorator(func):
-        @functools.wraps(func)
-        def wrapper(*args, **kwargs):
-            # リスト引数をタプルに変換してキャッシュする
-            args_key = tuple(cities_list_to_tuple(arg) if isinstance(arg, list) else arg for arg in args)
-            if args_key in cache_cities:
-                result, timestamp = cache_cities[args_key]
-                if time.time() - timestamp <= ttl:
-                    return result
-            result = func(*args, **kwargs)
-            cache_cities[args_key] = (result, time.time())
-            return result
-
-        return wrapper
-
-    return decorator
-
-@cache_cities_with_ttl()
-def get_city_regexes(pref: str, cities: list) -> tuple:
+
+def compile_city_regexes(cities: tuple) -> list:
     results = []
 
     for city in cities:
@@ -116,9 +539,101 @@ def get_city_regexes(pref: str, cities: list) -> tuple:
 
     return results
 
-def get_towns(pref: str, city: str, endpoint: str) -> list:
-    global cache_towns
+def get_city_match_keys(city: str) -> Tuple[List[str], bool]:
+    """
+    市区町村名からトライ木に登録するキーを作成する
+    町村の場合は郡名を省略したキーも作成する
+    戻り値は (キーのリスト, キーの一致だけで正規表現と同じ結果になるか)
+    """
+    names = [city]
+    if re.match(".*?([町村])$", city) is not None:
+        if city.count("郡") != 1 or city.startswith("郡"):
+            # 郡名の省略パターンが単純でない場合は常に候補とする
+            return [""], False
+        names.append(city[city.index("郡") + 1 :])
+
+    keys = [get_fold_key(name[: find_fold_stop_word(name)]) for name in names]
+    exact = all(len(key) == len(name) and is_exact_fold_key(name) for key, name in zip(keys, names))
+    return keys, exact
+
+
+def get_city_entries(prefectures: dict, cache: Optional[DatasetCache] = None) -> list:
+    """
+    市区町村ごとに (都道府県, 市区町村, 正規表現, トライ木のキー, キーの一致だけで判定できるか) を照合の優先順に返す
+    """
+    entries = []
+    for pref, cities in prefectures.items():
+        for city, reg in get_city_regexes(pref, cities, cache):
+            keys, exact = get_city_match_keys(city)
+            entries.append((pref, city, reg, keys, exact))
+    return entries
+
+
+def compile_city_index(entries: list) -> Tuple[list, dict]:
+    city_regexes = []
+    trie_entries = []
+    for pref, city, pattern, keys, exact in entries:
+        for key in keys:
+            trie_entries.append((key, (len(city_regexes), exact)))
+        city_regexes.append((pref, city, re.compile(pattern)))
+    return city_regexes, build_trie(trie_entries)
+
+
+def get_city_index(
+    prefectures: dict, endpoint: str, cache: Optional[DatasetCache] = None
+) -> Tuple[list, dict]:
+    """
+    全都道府県の市区町村の正規表現と、市区町村名から候補を引くためのトライ木を返す
+    """
+    cache = cache or default_cache
+
+    city_index = cache.get("city_indexes", endpoint)
+    if city_index is None or city_index[0] is not prefectures:
+        if is_dataset_endpoint(endpoint):
+            entries = open_dataset(endpoint).city_entries
+        else:
+            entries = get_city_entries(prefectures, cache)
+        city_index = (prefectures, *compile_city_index(entries))
+        cache.set("city_indexes", endpoint, city_index)
+
+    return city_index[1], city_index[2]
+
 
+def match_city_names(
+    addr: str,
+    prefectures: dict,
+    endpoint: str,
+    pref: Optional[str] = None,
+    cache: Optional[DatasetCache] = None,
+) -> List[Tuple[str, str, int]]:
+    """
+    住所の先頭にマッチする市区町村を、都道府県・市区町村の順に (都道府県, 市区町村, マッチの終了位置) で返す
+    pref を指定した場合は、その都道府県の市区町村だけを対象とする
+    """
+    city_regexes, city_trie = get_city_index(prefectures, endpoint, cache)
+
+    # キーの一致だけで判定できる市区町村は、郡名を含む長い方のキーの終了位置がマッチの終了位置になる
+    candidates = {}
+    for end, (index, exact) in search_prefixes(city_trie, addr.translate(FOLD_TABLE)):
+        candidates[index] = max(end, candidates.get(index, end)) if exact else None
+
+    matched = []
+    for index in sorted(candidates):
+        _pref, city, reg = city_regexes[index]
+        if pref is not None and _pref != pref:
+            continue
+        end = candidates[index]
+        if end is None:
+            match = reg.match(addr)
+            if match is None:
+                continue
+            end = match.end()
+        matched.append((_pref, city, end))
+
+    return matched
+
+
+def get_towns_url(pref: str, city: str, endpoint: str) -> str:
     town_endpoint = "/".join(
         [
             endpoint,
@@ -126,16 +641,49 @@ def get_towns(pref: str, city: str, endpoint: str) -> list:
             urllib.parse.quote(city),
         ]
     )
+    return f"{town_endpoint}.json"
 
-    endpoint_url = f"{town_endpoint}.json"
-    towns = cache_towns.get(endpoint_url)
-    if towns is None:
-        towns = list(json.loads((api_fetch(endpoint_url)).text))
-        cache_towns[endpoint_url] = towns
 
+def parse_towns(text: str) -> list:
+    return list(json.loads(text))
+
+
+def load_towns(
+    pref: str, city: str, endpoint: str, text: str, cache: Optional[DatasetCache] = None
+) -> list:
+    """
+    取得した町丁目データを読み込んでキャッシュする
+    """
+    towns = parse_towns(text)
+    (cache or default_cache).set("towns", get_towns_url(pref, city, endpoint), towns)
     return towns
 
-def get_town_regexes(pref: str, city: str, endpoint: str) -> list:
+
+def get_cached_towns(
+    pref: str, city: str, endpoint: str, cache: Optional[DatasetCache] = None
+) -> Optional[list]:
+    return (cache or default_cache).get("towns", get_towns_url(pref, city, endpoint))
+
+
+def get_towns(
+    pref: str, city: str, endpoint: str, cache: Optional[DatasetCache] = None
+) -> list:
+    endpoint_url = get_towns_url(pref, city, endpoint)
+    if is_dataset_endpoint(endpoint):
+        dataset = open_dataset(endpoint)
+        return fetch_once(endpoint_url, "towns", lambda: dataset.get_towns(pref, city), cache)
+
+    return fetch_once(
+        endpoint_url, "towns", lambda: fetch_json(endpoint_url, parse_towns, cache), cache
+    )
+
+def get_town_regexes(
+    pref: str,
+    city: str,
+    endpoint: str,
+    cache: Optional[DatasetCache] = None,
+    pre_towns: Optional[list] = None,
+) -> list:
     def get_normalized_chome_regex(match_value: str) -> str:
         regexes = [re.sub("(丁目?|番([町丁])|条|軒|線|([のノ])町|地割)", "", match_value)]
 
@@ -172,7 +720,7 @@ def get_town_regexes(pref: str, city: str, endpoint: str) -> list:
             kanji_numbers = find_kanji_numbers(x_cho.group())
             return len(kanji_numbers) > 0
 
-    api_pre_towns = get_towns(pref, city, endpoint)
+    api_pre_towns = pre_towns if pre_towns is not None else get_towns(pref, city, endpoint, cache)
     api_towns_set = [x["town"] for x in api_pre_towns]
     api_towns = []
     townAddr = ""
@@ -256,97 +804,369 @@ def get_town_regexes(pref: str, city: str, endpoint: str) -> list:
     return town_regexes
 
 
+def get_fold_key(value: str) -> str:
+    """
+    文字列のうち、正規表現を使わずに文字単位で照合できる先頭部分を同一視する文字にまとめて返す
+    """
+    key = []
+    for char in value:
+        if char in FOLD_STOP_CHARACTERS:
+            break
+        key.append(char)
+    return "".join(key).translate(FOLD_TABLE)
+
+
+@functools.lru_cache(maxsize=None)
+def is_exact_fold_character(char: str) -> bool:
+    """
+    正規表現がマッチする文字の集合と、同一視される文字の集合が一致するかを判定する
+    """
+    if char in FOLD_STOP_CHARACTERS:
+        return False
+    group = FOLD_GROUPS.get(char.translate(FOLD_TABLE), {char})
+    reg = re.compile(HYPHEN_REGEX if char in HYPHEN_CHARACTERS else to_regex(char))
+    return {_char for _char in group if reg.fullmatch(_char)} == group
+
+
+def is_exact_fold_key(value: str) -> bool:
+    """
+    文字列全体を、正規表現を使わずにキーの一致だけで照合できるかを判定する
+    """
+    return all(is_exact_fold_character(char) for char in value)
+
+
+def find_fold_stop_word(value: str) -> int:
+    """
+    to_regexで選択肢に置き換えられる文字列が最初に現れる位置を返す
+    """
+    end = len(value)
+    for word in FOLD_STOP_WORDS:
+        index = value.find(word)
+        if index != -1:
+            end = min(end, index)
+    return end
+
+
+def get_town_match_key(town_name: str) -> Tuple[str, bool, bool]:
+    """
+    町丁目名からトライ木に登録するキーを作成する
+    戻り値は (キー, 先頭の「大字」「字」が省略可能か, キーの一致だけで正規表現と同じ結果になるか)
+    """
+    aza_match = re.match("大?字", town_name)
+    if aza_match is not None:
+        town_name = town_name[aza_match.end() :]
+
+    # 「大字」、丁目の番号部分、to_regexで選択肢に置き換えられる文字列以降は正規表現で照合する
+    end = find_fold_stop_word(town_name)
+    for reg in (re.compile("大?字"), CHOME_REGEX):
+        match = reg.search(town_name)
+        if match is not None:
+            end = min(end, match.start())
+
+    key = get_fold_key(town_name[:end])
+    exact = len(key) == len(town_name) and is_exact_fold_key(town_name)
+    return key, aza_match is not None, exact
+
+
+def get_town_entries(
+    pref: str,
+    city: str,
+    endpoint: str,
+    cache: Optional[DatasetCache] = None,
+    towns: Optional[list] = None,
+) -> list:
+    """
+    町丁目ごとに (町丁目, 正規表現, 緯度, 経度, トライ木のキー, 「大字」「字」を省略できるか,
+    キーの一致だけで判定できるか) を照合の優先順に返す
+    """
+    entries = []
+    for town, pattern, lat, lng in get_town_regexes(pref, city, endpoint, cache, towns):
+        if pattern.startswith("^"):
+            # 丁目なしの数字だけを許容するパターンは先頭が町名そのもの
+            key, omit_aza, exact = get_fold_key(pattern[1:]), False, False
+        else:
+            key, omit_aza, exact = get_town_match_key(town["town"])
+        entries.append((town, pattern, lat, lng, key, omit_aza, exact))
+    return entries
+
+
+class LazyPattern:
+    """
+    初めて使うときにコンパイルする正規表現
+    トライ木で候補を絞り込むため、ほとんどの町丁目の正規表現は使われない
+    """
+
+    __slots__ = ("pattern", "compiled")
+
+    def __init__(self, pattern: str):
+        self.pattern = pattern
+        self.compiled = None
+
+    def get(self) -> Pattern:
+        if self.compiled is None:
+            self.compiled = re.compile(self.pattern)
+        return self.compiled
+
+    def match(self, string: str, pos: int = 0) -> Optional[re.Match]:
+        return self.get().match(string, pos)
+
+    def search(self, string: str, pos: int = 0) -> Optional[re.Match]:
+        return self.get().search(string, pos)
+
+
+def compile_town_matcher(entries: list) -> Tuple[list, dict]:
+    compiled_town_regexes = []
+    trie_entries = []
+    for index, (town, pattern, lat, lng, key, omit_aza, exact) in enumerate(entries):
+        compiled_town_regexes.append((town, LazyPattern(pattern), lat, lng))
+        trie_entries.append((key, (index, omit_aza, exact)))
+    return compiled_town_regexes, build_trie(trie_entries)
+
+
+def get_town_matcher(
+    pref: str, city: str, endpoint: str, cache: Optional[DatasetCache] = None
+) -> Tuple[list, dict]:
+    """
+    コンパイル済みの町丁目の正規表現と、候補を絞り込むためのトライ木を返す
+    町丁目データが変わっていなければ（条件付きの取得で 304 が返った場合を含む）作り直さない
+    """
+    cache = cache or default_cache
+
+    if is_dataset_endpoint(endpoint):
+        return get_dataset_town_matcher(pref, city, endpoint, cache)
+
+    towns = get_towns(pref, city, endpoint, cache)
+    key = (endpoint, pref, city)
+    town_matcher = cache.get("town_matchers", key)
+    if town_matcher is None or town_matcher[0] is not towns:
+        entries = get_town_entries(pref, city, endpoint, cache, towns)
+        town_matcher = (towns, *compile_town_matcher(entries))
+        cache.set("town_matchers", key, town_matcher)
+
+    return town_matcher[1], town_matcher[2]
+
+
+def get_dataset_town_matcher(
+    pref: str, city: str, endpoint: str, cache: DatasetCache
+) -> Tuple[list, dict]:
+    """
+    住所データファイルの市区町村のデータを1度だけ復元し、町丁目データと照合用データの両方をキャッシュする
+    住所データファイルが作り直された場合（バージョンが変わった場合）は復元し直す
+    """
+    dataset = open_dataset(endpoint)
+    towns = get_cached_towns(pref, city, endpoint, cache)
+    key = (endpoint, pref, city)
+    town_matcher = cache.get("town_matchers", key)
+    if (
+        towns is None
+        or town_matcher is None
+        or town_matcher[0] is not towns
+        or town_matcher[3] != dataset.version
+    ):
+        towns, entries = dataset.get_city(pref, city)
+        town_matcher = (towns, *compile_town_matcher(entries), dataset.version)
+        cache.set("towns", get_towns_url(pref, city, endpoint), towns)
+        cache.set("town_matchers", key, town_matcher)
+
+    return town_matcher[1], town_matcher[2]
+
+
+def find_town_candidates(town_trie: dict, addr: str) -> List[Tuple[int, Optional[int]]]:
+    """
+    トライ木から住所にマッチする可能性がある町丁目を優先順に (番号, マッチの終了位置) で返す
+    キーの一致だけで判定できない町丁目の終了位置は None になる
+    """
+    folded_addr = addr.translate(FOLD_TABLE)
+    candidates = {}
+    for start in (0, 1, 2):
+        # 「大字」「字」で始まる町丁目は、住所の先頭の「大字」「字」を省略して照合する
+        if start > 0 and addr[:start] not in ("字", "大字"):
+            continue
+        for end, (index, omit_aza, exact) in search_prefixes(town_trie, folded_addr, start):
+            if start > 0 and not omit_aza:
+                continue
+            # 「大字」「字」は省略可能でも先にマッチさせるため、終了位置が後ろのものを優先する
+            candidates[index] = max(end, candidates.get(index, end)) if exact else None
+
+    return sorted(candidates.items())
+
+
+def find_last_match(regex: LazyPattern, addr: str, last_start: int) -> Optional[re.Match]:
+    """
+    last_start 以前の位置から始まる正規表現のマッチのうち、最も後ろから始まるものを返す
+    """
+    match = regex.search(addr)
+    if match is None or match.start() > last_start:
+        return None
+    # 住所の末尾より後ろの位置を指定しても末尾から探すため、末尾で見つかった場合は終える
+    while match.start() < len(addr):
+        following = regex.search(addr, match.start() + 1)
+        if following is None or following.start() > last_start:
+            break
+        match = following
+    return match
+
+
+def find_kyoto_town(town_regexes: list, town_trie: dict, addr: str) -> Optional[Tuple[int, int]]:
+    """
+    京都の通り名（「寺町通御池上る」など）を読み飛ばして町丁目を探し、(番号, マッチの終了位置) を返す
+    優先順で最初の町丁目のうち、住所の最も後ろから始まるものを返す（町丁目の正規表現の前に「.*」を付けて照合した場合と同じ結果）
+    町丁目ごとに住所全体を照合し直さず、住所を1度走査してトライ木のキーが現れる位置を候補として集め、
+    優先順・後ろの位置の順に照合する
+    「.*」は改行を読み飛ばさないため、町丁目は最初の改行の位置までに始まるものだけを探す
+    """
+    folded_addr = addr.translate(FOLD_TABLE)
+    last_start = addr.find("\n")
+    if last_start < 0:
+        last_start = len(addr)
+    # キーが空の町丁目（丁目の番号から始まるものなど）は位置を決めずに候補とする（位置は -1）
+    candidates = [(index, -1, None) for index, _, _ in town_trie.get(None, ())]
+    for start, char in enumerate(folded_addr[:last_start + 1]):
+        node = town_trie.get(char)
+        if node is None:
+            continue
+        for end, (index, _, exact) in search_prefixes(node, folded_addr, start + 1):
+            candidates.append((index, start, end if exact else None))
+    candidates.sort(key=lambda candidate: (candidate[0], -candidate[1]))
+
+    for index, start, end in candidates:
+        if end is not None:
+            return index, end
+        regex = town_regexes[index][1]
+        match = find_last_match(regex, addr, last_start) if start < 0 else regex.match(addr, start)
+        if match is not None:
+            return index, match.end()
+    return None
+
+
+# 番地・号の数字（算用数字・漢数字）
+ADDR_NUMBER_REGEX = "[0-9〇一二三四五六七八九十百千]+"
+ADDR_KANJI_NUMBERS = frozenset("〇一二三四五六七八九十百千")
+# 数字の間で「-」に置き換える区切り
+ADDR_SEPARATORS = frozenset(HYPHEN_CHARACTERS + "の")
+
+
+def replace_chome_number(match: re.Match) -> str:
+    match_value = match.group()
+    for num in list(ARABIC_NUMBER_REGEX.finditer(match_value)):
+        match_value = match_value.replace(
+            num.group(), kanjize.number2kanji(int(num.group()))
+        )
+    return match_value
+
+
+def replace_hyphen_number(match: re.Match) -> str:
+    return HYPHEN_SUB_REGEX.sub("-", kan2num(match.group()))
+
+
+ARABIC_NUMBER_REGEX = re.compile("([0-9]+)")
+HYPHEN_SUB_REGEX = re.compile(HYPHEN_REGEX)
+
+# 数字の並びの途中からは照合しない（照合に失敗した数字の並びを、途中の位置から何度も照合し直さないため）
+ADDR_NUMBER_START = "(?<![0-9〇一二三四五六七八九十百千])"
+
+REPLACE_ADDR_REGEXES = [
+    (re.compile("(?<![0-9])([0-9]+)(丁目)"), replace_chome_number),
+    (
+        re.compile(f"{ADDR_NUMBER_START}(({ADDR_NUMBER_REGEX})(番地?)({ADDR_NUMBER_REGEX})号)\\s*(.+)"),
+        lambda m: "{} {}".format(m.group(1), m.group(5)),
+    ),
+    (
+        re.compile(f"{ADDR_NUMBER_START}({ADDR_NUMBER_REGEX})\\s*(番地?)\\s*([(0-9〇一二三四五六七八九十百千]+)\\s*号?"),
+        lambda m: "{}-{}".format(m.group(1), m.group(3)),
+    ),
+    (re.compile(f"{ADDR_NUMBER_START}({ADDR_NUMBER_REGEX})番地?"), r"\1"),
+    (re.compile(f"{ADDR_NUMBER_START}({ADDR_NUMBER_REGEX})の"), r"\1-"),
+    (re.compile(f"{ADDR_NUMBER_START}({ADDR_NUMBER_REGEX}){HYPHEN_REGEX}"), replace_hyphen_number),
+    (re.compile(f"{HYPHEN_REGEX}({ADDR_NUMBER_REGEX})"), replace_hyphen_number),
+    (re.compile(f"{ADDR_NUMBER_START}({ADDR_NUMBER_REGEX})-"), lambda m: kan2num(m.group())),
+    (re.compile(f"-({ADDR_NUMBER_REGEX})"), lambda m: kan2num(m.group())),
+    (re.compile(f"-[^0-9]({ADDR_NUMBER_REGEX})"), lambda m: kan2num(m.group())),
+    (re.compile(f"{ADDR_NUMBER_START}({ADDR_NUMBER_REGEX})$"), lambda m: kan2num(m.group())),
+]
+
+
+def split_addr_numbers(addr: str) -> Optional[List[str]]:
+    """
+    番地・号を1度の走査で数字に分解し、算用数字のリストを返す
+    次の形式だけを扱い、それ以外（建物名などを含む場合）は None を返す
+      数字（区切り 数字）...        例: 1-2-3, 1の2, 一－二
+      数字 番[地] 数字[号]          例: 4番26号, 12番地1
+      数字 番[地] 数字（区切り 数字）... 例: 12番地1-5
+      数字 番[地]                   例: 260番
+    数字は算用数字だけ、または漢数字だけの並びとする
+    """
+    length = len(addr)
+    # 先頭の「-」は1つだけ取り除く
+    position = 1 if addr.startswith("-") else 0
+    numbers = []
+    ban = False
+
+    while True:
+        start = position
+        if position < length and "0" <= addr[position] <= "9":
+            while position < length and "0" <= addr[position] <= "9":
+                position += 1
+            numbers.append(addr[start:position])
+        else:
+            while position < length and addr[position] in ADDR_KANJI_NUMBERS:
+                position += 1
+            if position == start:
+                return None
+            number = kan2num(addr[start:position])
+            if not (number.isascii() and number.isdigit()):
+                return None
+            numbers.append(number)
+
+        if position == length:
+            return numbers
+
+        char = addr[position]
+        if char == "番" and len(numbers) == 1:
+            ban = True
+            position += 1
+            if addr.startswith("地", position):
+                position += 1
+            if position == length:
+                return numbers
+        elif char == "号" and ban and len(numbers) == 2 and position + 1 == length:
+            return numbers
+        elif char in ADDR_SEPARATORS:
+            position += 1
+        else:
+            return None
+
+
 def replace_addr(addr: str) -> str:
-    def replace_1(match_value: str) -> str:
-        for num in list(re.finditer("([0-9]+)", match_value)):
-            match_value = match_value.replace(
-                num.group(), kanjize.number2kanji(int(num.group()))
-            )
-        return match_value
-
-    addr = re.sub("^-", "", addr)
-
-    patterns = [
-        (re.compile("([0-9]+)(丁目)"), lambda m: replace_1(m.group())),
-        (
-            re.compile("(([0-9〇一二三四五六七八九十百千]+)(番地?)([0-9〇一二三四五六七八九十百千]+)号)\\s*(.+)"),
-            lambda m: "{} {}".format(m.group(1), m.group(5)),
-        ),
-        (
-            re.compile("([0-9〇一二三四五六七八九十百千]+)\\s*(番地?)\\s*([(0-9〇一二三四五六七八九十百千]+)\\s*号?"),
-            lambda m: "{}-{}".format(m.group(1), m.group(3)),
-        ),
-        (re.compile("([0-9〇一二三四五六七八九十百千]+)番地?"), r"\1"),
-        (re.compile("([0-9〇一二三四五六七八九十百千]+)の"), r"\1-"),
-        (
-            re.compile("([0-9〇一二三四五六七八九十百千]+)[-－﹣−‐⁃‑‒–—﹘―⎯⏤ーｰ─━]"),
-            lambda m: re.sub("[-－﹣−‐⁃‑‒–—﹘―⎯⏤ーｰ─━]", "-", kan2num(m.group())),
-        ),
-        (
-            re.compile("[-－﹣−‐⁃‑‒–—﹘―⎯⏤ーｰ─━]([0-9〇一二三四五六七八九十百千]+)"),
-            lambda m: re.sub("[-－﹣−‐⁃‑‒–—﹘―⎯⏤ーｰ─━]", "-", kan2num(m.group())),
-        ),
-        (re.compile("([0-9〇一二三四五六七八九十百千]+)-"), lambda m: kan2num(m.group())),
-        (re.compile("-([0-9〇一二三四五六七八九十百千]+)"), lambda m: kan2num(m.group())),
-        (re.compile("-[^0-9]([0-9〇一二三四五六七八九十百千]+)"), lambda m: kan2num(m.group())),
-        (re.compile("([0-9〇一二三四五六七八九十百千]+)$"), lambda m: kan2num(m.group())),
-    ]
-
-    for pattern, repl in patterns:
-        addr = pattern.sub(repl, addr)
+    """
+    番地・号を「-」で区切った算用数字にする
+    よくある形式は1度の走査で変換し、それ以外は正規表現を順に適用する
+    """
+    numbers = split_addr_numbers(addr)
+    if numbers is not None:
+        return "-".join(numbers)
+
+    return replace_addr_with_regexes(addr)
 
-    return addr.strip()
 
+def replace_addr_with_regexes(addr: str) -> str:
+    if addr.startswith("-"):
+        addr = addr[1:]
+
+    for pattern, repl in REPLACE_ADDR_REGEXES:
+        addr = pattern.sub(repl, addr)
 
-def jis_kanji_regexes() -> Generator[Tuple[Pattern, str, str], None, None]:
-    for old_kanji, new_kanji in zip(JIS_OLD_KANJI, JIS_NEW_KANJI):
-        regex = re.compile(f"{old_kanji}|{new_kanji}")
-        yield regex, old_kanji, new_kanji
+    return addr.strip()
 
 
 def jis_kanji_to_both_forms(value: str) -> str:
-    _value = value
-    for reg, old_kanji, new_kanji in jis_kanji_regexes():
-        pattern = re.compile(reg)
-        _value = pattern.sub(f"({old_kanji}|{new_kanji})", _value)
-    return _value
+    return value.translate(JIS_KANJI_TABLE)
 
 
 def to_regex(value: str) -> str:
-    # 以下なるべく文字数が多いものほど上にすること
-    patterns = [
-        ("三栄町|四谷三栄町", "(三栄町|四谷三栄町)"),
-        ("鬮野川|くじ野川|くじの川", "(鬮野川|くじ野川|くじの川)"),
-        ("通り|とおり", "(通り|とおり)"),
-        ("柿碕町|柿さき町", "(柿碕町|柿さき町)"),
-        ("埠頭|ふ頭", "(埠頭|ふ頭)"),
-        ("番町|番丁", "(番町|番丁)"),
-        ("大冝|大宜", "(大冝|大宜)"),
-        ("穝|さい", "(穝|さい)"),
-        ("杁|えぶり", "(杁|えぶり)"),
-        ("薭|稗|ひえ|ヒエ", "(薭|稗|ひえ|ヒエ)"),
-        ("[之ノの]", "[之ノの]"),
-        ("[ヶケが]", "[ヶケが]"),
-        ("[ヵカか力]", "[ヵカか力]"),
-        ("[ッツっつ]", "[ッツっつ]"),
-        ("[ニ二]", "[ニ二]"),
-        ("[ハ八]", "[ハ八]"),
-        ("[塚塚]", "[塚塚]"),
-        ("[釜竈]", "[釜竈]"),
-        ("[條条]", "[條条]"),
-        ("[狛拍]", "[狛拍]"),
-        ("[藪薮]", "[藪薮]"),
-        ("[渕淵]", "[渕淵]"),
-        ("[エヱえ]", "[エヱえ]"),
-        ("[曾曽]", "[曾曽]"),
-        ("[舟船]", "[舟船]"),
-        ("[莵菟]", "[莵菟]"),
-        ("[市巿]", "[市巿]"),
-    ]
-
     # コンパイル済み正規表現オブジェクトのリストを順番に適用
-    for pattern in [(re.compile(p[0]), p[1]) for p in patterns]:
-        value = pattern[0].sub("({})".format(pattern[0].pattern), value)
+    for reg, replacement in TO_REGEX_REGEXES:
+        value = reg.sub(replacement, value)
 
     value = jis_kanji_to_both_forms(value)
 
@@ -354,7 +1174,7 @@ def to_regex(value: str) -> str:
 
 
 def normalize_town_name(
-    addr: str, pref: str, city: str, endpoint: str
+    addr: str, pref: str, city: str, endpoint: str, cache: Optional[DatasetCache] = None
 ) -> Optional[Dict[str, str]]:
     # アドレスの前後の空白を削除する
     addr = addr.strip()
@@ -363,37 +1183,37 @@ def normalize_town_name(
     addr = re.sub("^大字", "", addr)
 
     # 町名の正規化
-    regex_prefixes = ["^"]
-    if re.match("^京都市", city):
-        # 京都は通り名削除のために後方一致を使う
-        regex_prefixes.append(".*")
-
-    for regex_prefix in regex_prefixes:
-        for town, pattern, lat, lng in get_town_regexes(pref, city, endpoint):
-            if regex_prefix == "^":
-                regex = re.compile(f"{regex_prefix}{pattern}")
-                match = regex.match(addr)
-                if match:
-                    # 正規表現にマッチした場合、辞書型で町の名前、住所、緯度、経度を返す
-                    return {
-                        "town": town,
-                        "addr": addr[len(match.group()) :],
-                        "lat": lat,
-                        "lng": lng,
-                    }
-            else:
-                regex = re.compile(f"{regex_prefix}{pattern}")
-                match = regex.match(addr)
-                if match:
-                    # 正規表現にマッチした場合、辞書型で町の名前、住所、緯度、経度を返す
-                    return {
-                        "town": town,
-                        "addr": re.search(pattern, match.group()).group()
-                        if len(addr) == len(match.group())
-                        else addr[len(match.group()) :],
-                        "lat": lat,
-                        "lng": lng,
-                    }
-        
+    # トライ木で絞り込んだ候補だけを優先順に正規表現で照合する
+    town_regexes, town_trie = get_town_matcher(pref, city, endpoint, cache)
+    for index, end in find_town_candidates(town_trie, addr):
+        town, regex, lat, lng = town_regexes[index]
+        if end is None:
+            match = regex.match(addr)
+            if match is None:
+                continue
+            end = match.end()
+
+        # マッチした場合、辞書型で町の名前、住所、緯度、経度を返す
+        return {
+            "town": town,
+            "addr": addr[end:],
+            "lat": lat,
+            "lng": lng,
+        }
+
+    # 京都は通り名削除のために後方一致を使う
+    if city.startswith("京都市"):
+        found = find_kyoto_town(town_regexes, town_trie, addr)
+        if found is not None:
+            index, end = found
+            town, regex, lat, lng = town_regexes[index]
+            return {
+                "town": town,
+                # 住所の末尾が町丁目の場合は、住所から最初に見つかる町丁目の部分を返す
+                "addr": regex.search(addr).group() if end == len(addr) else addr[end:],
+                "lat": lat,
+                "lng": lng,
+            }
+
     # 正規表現にマッチしなかった場合は None を返す
     return None
@@ -0,0 +1,29 @@
+from typing import Any, Iterable, List, Tuple
+
+
+def build_trie(entries: Iterable[Tuple[str, Any]]) -> dict:
+    """
+    キーと値の組からトライ木を作成する
+    各ノードは文字をキーとした辞書で、キーの終端には None をキーとして値のリストを持つ
+    """
+    trie = {}
+    for key, value in entries:
+        node = trie
+        for char in key:
+            node = node.setdefault(char, {})
+        node.setdefault(None, []).append(value)
+    return trie
+
+
+def search_prefixes(trie: dict, text: str, start: int = 0) -> List[Tuple[int, Any]]:
+    """
+    text[start:] の接頭辞となるキーに登録された値を、キーの終了位置との組ですべて返す
+    """
+    values = [(start, value) for value in trie.get(None, ())]
+    node = trie
+    for index in range(start, len(text)):
+        node = node.get(text[index])
+        if node is None:
+            break
+        values.extend((index + 1, value) for value in node.get(None, ()))
+    return values
@@ -1,4 +1,6 @@
+import functools
 import re
+from typing import Optional
 
 from kanjize import kanji2number
 
@@ -10,11 +12,84 @@ from .japaneseNumerics import (
 )
 
 
+# 大字（壱・弐・廿・萬など）を通常の漢数字にする変換表
+OLD_JAPANESE_NUMERICS_TABLE = str.maketrans(OLD_JAPANESE_NUMERICS)
+
+# 漢数字の数字・数詞の値
+KANJI_DIGITS = {"一": 1, "二": 2, "三": 3, "四": 4, "五": 5, "六": 6, "七": 7, "八": 8, "九": 9}
+KANJI_SMALL_UNITS = {"十": 10, "百": 100, "千": 1000}
+KANJI_LARGE_UNITS = {"万": 10000, "億": 10000**2, "兆": 10000**3, "京": 10000**4}
+
+# 漢数字の数字だけの並び（位取りで読む）
+KANJI_POSITIONAL_DIGITS = frozenset("〇一二三四五六七八九")
+JAPANESE_NUMERICS_TABLE = str.maketrans(JAPANESE_NUMERICS)
+
+# 漢数字を探す正規表現
+KANJI_NUMBER_PATTERN = "([0-9０-９]*)|([〇一二三四五六七八九壱壹弐弍貳貮参參肆伍陸漆捌玖]*)"
+KANJI_NUMBER_BASE_PATTERN = (
+    f"(({KANJI_NUMBER_PATTERN})(千|阡|仟))?"
+    f"(({KANJI_NUMBER_PATTERN})(百|陌|佰))?"
+    f"(({KANJI_NUMBER_PATTERN})(十|拾))?"
+    f"({KANJI_NUMBER_PATTERN})?"
+)
+KANJI_NUMBER_REGEX = re.compile(
+    f"(({KANJI_NUMBER_BASE_PATTERN}兆)?({KANJI_NUMBER_BASE_PATTERN}億)?"
+    f"({KANJI_NUMBER_BASE_PATTERN}(万|萬))?{KANJI_NUMBER_BASE_PATTERN})"
+)
+ARABIC_NUMBER_REGEX = re.compile("^[0-9０-９]+$")
+
+# 変換結果を残しておく件数
+KANJI_NUMBER_CACHE_SIZE = 4096
+
+
 def normalize(japanese: str) -> str:
-    for key, value in OLD_JAPANESE_NUMERICS.items():
-        japanese = re.sub(key, value, japanese)
+    return japanese.translate(OLD_JAPANESE_NUMERICS_TABLE)
+
+
+def parse_kanji_number(kanji: str) -> Optional[int]:
+    """
+    漢数字を1度の走査で数値にする
+    数詞（十・百・千、万・億・兆・京）が大きい順に1度ずつ並ぶ表記だけを扱い、
+    それ以外（数字が続く位取りの表記や〇を含むものなど）は None を返す
+    """
+    total = 0
+    section = 0
+    digit = None
+    small_unit = 10000
+    large_unit = 10000**5
+
+    for char in kanji:
+        if char in KANJI_DIGITS:
+            if digit is not None:
+                return None
+            digit = KANJI_DIGITS[char]
+        elif char in KANJI_SMALL_UNITS:
+            unit = KANJI_SMALL_UNITS[char]
+            if unit >= small_unit:
+                return None
+            # 「十」「百」「千」の前の数字は省略できる（一を表す）
+            section += (1 if digit is None else digit) * unit
+            small_unit = unit
+            digit = None
+        elif char in KANJI_LARGE_UNITS:
+            unit = KANJI_LARGE_UNITS[char]
+            if unit >= large_unit:
+                return None
+            if digit is not None:
+                section += digit
+            if section == 0:
+                return None
+            total += section * unit
+            large_unit = unit
+            section = 0
+            digit = None
+            small_unit = 10000
+        else:
+            return None
 
-    return japanese
+    if digit is not None:
+        section += digit
+    return total + section
 
 
 def split_large_number(japanese: str) -> dict:
@@ -53,7 +128,7 @@ def split_large_number(japanese: str) -> dict:
     if len(kanji) > 0:
         try:
             numbers["千"] = kanji2number(kanji)
-        except:
+        except ValueError:
             numbers["千"] = kanjize_error_kanji_to_int(kanji)
     else:
         numbers["千"] = 0
@@ -61,38 +136,59 @@ def split_large_number(japanese: str) -> dict:
     return numbers
 
 
-def kan2num(value: str) -> str:
-    def _kanji_to_integer(kanji_number: str) -> int:
-        kanji_number = normalize(kanji_number)
+@functools.lru_cache(maxsize=KANJI_NUMBER_CACHE_SIZE)
+def kanji_to_integer(kanji_number: str) -> int:
+    """
+    漢数字を数値にする
+    数字だけの位取りの表記（三〇八など）は表で変換し、規則どおりの表記は parse_kanji_number で変換する
+    それ以外（千二三四などの不規則な表記）は従来の方法で変換する
+    """
+    kanji_number = normalize(kanji_number)
 
-        if (
-            re.match("〇", kanji_number) is not None
-            or re.match("^[〇一二三四五六七八九]+$", kanji_number) is not None
-        ):
-            for key, value in JAPANESE_NUMERICS.items():
-                kanji_number = kanji_number.replace(key, value)
+    # 漢数字の数字だけの場合は位取りで読む
+    if len(kanji_number) > 0 and all(char in KANJI_POSITIONAL_DIGITS for char in kanji_number):
+        return int(kanji_number.translate(JAPANESE_NUMERICS_TABLE))
 
-            return int(kanji_number)
-        else:
-            number = 0
-            numbers = split_large_number(kanji_number)
+    if not kanji_number.startswith("〇"):
+        number = parse_kanji_number(kanji_number)
+        if number is not None:
+            return number
+
+    return split_kanji_to_integer(kanji_number)
 
-            for key, value in LARGE_NUMBERS.items():
-                if key in numbers:
-                    n = numbers[key]
-                    number = number + n
 
-            if not str(number).isdigit() or not str(numbers["千"]).isdigit():
-                raise TypeError(
-                    "The attribute of _kanji_to_integer() must be a Japanese numeral as integer."
-                )
+def split_kanji_to_integer(kanji_number: str) -> int:
+    if (
+        re.match("〇", kanji_number) is not None
+        or re.match("^[〇一二三四五六七八九]+$", kanji_number) is not None
+    ):
+        for key, value in JAPANESE_NUMERICS.items():
+            kanji_number = kanji_number.replace(key, value)
 
-            return number + numbers["千"]
-    
+        return int(kanji_number)
+    else:
+        number = 0
+        numbers = split_large_number(kanji_number)
+
+        for key, value in LARGE_NUMBERS.items():
+            if key in numbers:
+                n = numbers[key]
+                number = number + n
+
+        if not str(number).isdigit() or not str(numbers["千"]).isdigit():
+            raise TypeError(
+                "The attribute of _kanji_to_integer() must be a Japanese numeral as integer."
+            )
+
+        return number + numbers["千"]
+
+
+@functools.lru_cache(maxsize=KANJI_NUMBER_CACHE_SIZE)
+def kan2num(value: str) -> str:
     # エラーが発生した場合、そのままの文字列を返す
     try:
         for fromValue in find_kanji_numbers(value):
-            value = value.replace(fromValue, str(_kanji_to_integer(fromValue)))
+            value = value.replace(fromValue, str(kanji_to_integer(fromValue)))
     except Exception as e:
         pass
 
@@ -100,11 +196,28 @@ def kan2num(value: str) -> str:
 
 
 def find_kanji_numbers(text: str) -> list:
+    match_kanji = find_kanji_number(text)
+    return [match_kanji] if len(match_kanji) > 0 else []
+
+
+@functools.lru_cache(maxsize=KANJI_NUMBER_CACHE_SIZE)
+def find_kanji_number(text: str) -> str:
+    """
+    文字列に含まれる漢数字を探し、見つかったものをつなげて返す
+    """
+    # 文字列全体が漢数字（数字の並び、または規則どおりの表記）の場合は、正規表現で探さずにそのまま返す
+    # （KANJI_NUMBER_REGEX は「京」を含まないため、「京」を含む場合は正規表現で探す）
+    if len(text) > 0 and (
+        all(char in KANJI_POSITIONAL_DIGITS for char in text)
+        or ("京" not in text and parse_kanji_number(text) is not None)
+    ):
+        return text
+
     def isItemLength(item: str) -> bool:
         if item is None:
             return False
 
-        if re.match("^[0-9０-９]+$", item) is None and (
+        if ARABIC_NUMBER_REGEX.match(item) is None and (
             len(item) > 0
             and "兆" != item
             and "億" != item
@@ -115,32 +228,22 @@ def find_kanji_numbers(text: str) -> list:
         else:
             return False
 
-    num = "([0-9０-９]*)|([〇一二三四五六七八九壱壹弐弍貳貮参參肆伍陸漆捌玖]*)"
-    base_pattern = f"(({num})(千|阡|仟))?(({num})(百|陌|佰))?(({num})(十|拾))?({num})?"
-    pattern = (
-        f"(({base_pattern}兆)?({base_pattern}億)?({base_pattern}(万|萬))?{base_pattern})"
-    )
-    regex = re.compile(pattern)
-
-    match = regex.finditer(text)
-
     match_kanji = ""
-    return_kanji = []
-    if match is not None:
-        for m in match:
-            if isItemLength(m.group()):
-                match_kanji += m.group()
-
-        if len(match_kanji) > 0:
-            return_kanji.append(match_kanji)
-    return return_kanji
+    for m in KANJI_NUMBER_REGEX.finditer(text):
+        if isItemLength(m.group()):
+            match_kanji += m.group()
+    return match_kanji
+
+
+# 全角の英数字を半角に変換する表
+ZENKAKU_TO_HANKAKU_TABLE = str.maketrans(
+    {
+        **{chr(0xFF10 + i): chr(0x30 + i) for i in range(10)},
+        **{chr(0xFF21 + i): chr(0x41 + i) for i in range(26)},
+        **{chr(0xFF41 + i): chr(0x61 + i) for i in range(26)},
+    }
+)
 
 
 def zenkaku_to_hankaku(value: str) -> str:
-    return (
-        value.translate(
-            str.maketrans({chr(0xFF10 + i): chr(0x30 + i) for i in range(10)})
-        )
-        .translate(str.maketrans({chr(0xFF21 + i): chr(0x41 + i) for i in range(26)}))
-        .translate(str.maketrans({chr(0xFF41 + i): chr(0x61 + i) for i in range(26)}))
-    )
+    return value.translate(ZENKAKU_TO_HANKAKU_TABLE)
@@ -2,18 +2,26 @@ import re
 import json
 import unicodedata
 
-from typing import Tuple, Optional
+from typing import Callable, Iterable, List, Tuple, Optional, Union
 
 from .library.regex import (
     get_prefectures,
-    get_prefecture_regexes,
-    get_city_regexes,
+    get_prefecture_regex,
+    match_city_names,
     replace_addr,
     normalize_town_name,
-    set_ttl,
+    DatasetCache,
+    default_cache,
+    get_ttl_cache,
+    DEFAULT_TTL,
+    DEFAULT_CACHE_SIZE,
+    HYPHEN_CHARACTERS,
 )
+from .library.dataset import is_dataset_endpoint, open_dataset
+from .library.disk_cache import DiskCache
+from .preload import preload_caches, ProgressCallback
 from .library.patchAddr import patch_addr
-from .library.utils import zenkaku_to_hankaku
+from .library.utils import ZENKAKU_TO_HANKAKU_TABLE
 
 SPACE: str = " "
 HYPHEN: str = "-"
@@ -24,26 +32,267 @@ DEFAULT_ENDPOINT = "https://geolonia.github.io/japanese-addresses/api/ja"
 # オプションのレベル設定
 DEFAULT_LEVEL = 3
 
+# 正規化する住所の最大の長さ（これより長い文字列は住所ではないとみなし、正規化しない）
+# 既定では制限しない
+DEFAULT_MAX_LENGTH: Optional[int] = None
 
-def normalize(address: str, **kwargs) -> str:
+
+class Normalizer:
+    """
+    住所正規化
+    endpoint・TTL・キャッシュの上限件数ごとにインスタンスを作成する
+    キャッシュはインスタンスごとに持つため、異なる住所データを使うインスタンスを同時に利用できる
+    また、複数のスレッドから同時に利用できる
+
+    normalizer = Normalizer(endpoint="file:///path/to/api/ja", ttl=60 * 60)
+    normalizer.normalize("北海道札幌市西区24-2-2-3-3")
+    """
+
+    def __init__(
+        self,
+        endpoint: str = DEFAULT_ENDPOINT,
+        level: int = DEFAULT_LEVEL,
+        ttl: int = DEFAULT_TTL,
+        maxsize: int = DEFAULT_CACHE_SIZE,
+        cache: Optional[DatasetCache] = None,
+        disk_cache: Optional[Union[DiskCache, str]] = None,
+        result_cache_size: int = 0,
+        max_length: Optional[int] = DEFAULT_MAX_LENGTH,
+    ):
+        """
+        :param endpoint: 住所データのendpoint
+        :param level: 正規化レベル
+        :param ttl: キャッシュの有効期間（秒）
+        :param maxsize: キャッシュの上限件数
+        :param cache: 他のインスタンスと共有するキャッシュ（省略時はインスタンスごとに作成）
+        :param disk_cache: 取得した住所データを保存するディスクキャッシュ（SQLite のファイルのパス）
+        :param result_cache_size: 正規化した結果をキャッシュする件数（0 の場合はキャッシュしない）
+        :param max_length: 正規化する住所の最大の長さ（None の場合は制限しない）
+        """
+        self.endpoint = endpoint
+        self.level = level
+        self.max_length = max_length
+        if isinstance(disk_cache, str):
+            disk_cache = DiskCache(disk_cache)
+        self.cache = (
+            cache
+            if cache is not None
+            else DatasetCache(ttl, maxsize, disk_cache, result_cache_size)
+        )
+
+    def normalize(self, address: str, level: Optional[int] = None) -> dict:
+        """
+        住所正規化
+        :param address: 住所
+        :param level: 正規化レベル（省略時はインスタンスの正規化レベル）
+        :return: 正規化後の住所
+        """
+        level = self.level if level is None else level
+        if is_too_long(address, self.max_length):
+            return get_unnormalized_result(address)
+
+        # 正規化した結果のキャッシュ（住所データが変わった場合は使わない）
+        result_key = (self.endpoint, address, level, self.get_data_version())
+        if self.cache.result_cache_size > 0:
+            result = self.cache.get_result(result_key)
+            if result is not None:
+                return result
+
+        # 都道府県情報を取得
+        prefectures = get_prefectures(self.endpoint, self.cache)
+
+        # 市区町村までの正規化
+        addr, pref, city = normalize_until_city(
+            address, prefectures, level, self.endpoint, self.cache
+        )
+
+        # 町丁目以降の正規化
+        result = normalize_after_city(addr, pref, city, level, self.endpoint, self.cache)
+        if self.cache.result_cache_size > 0:
+            self.cache.set_result(result_key, result)
+        return result
+
+    def normalize_many(
+        self, addresses: Iterable[str], level: Optional[int] = None
+    ) -> List[dict]:
+        """
+        住所の一括正規化
+        市区町村までを正規化した後、都道府県・市区町村ごとにまとめて町丁目以降を正規化する
+        :param addresses: 住所のリスト
+        :param level: 正規化レベル（省略時はインスタンスの正規化レベル）
+        :return: 正規化後の住所のリスト（入力順）
+        """
+        level = self.level if level is None else level
+        use_result_cache = self.cache.result_cache_size > 0
+        version = self.get_data_version() if use_result_cache else None
+
+        # 都道府県情報を取得
+        prefectures = get_prefectures(self.endpoint, self.cache)
+
+        # 市区町村までの正規化（同じ住所は1度だけ正規化する）
+        addresses = list(addresses)
+        address_parts = {}
+        groups = {}
+        results = {}
+        for address in addresses:
+            if address in address_parts or address in results:
+                continue
+            if is_too_long(address, self.max_length):
+                results[address] = get_unnormalized_result(address)
+                continue
+            if use_result_cache:
+                result = self.cache.get_result((self.endpoint, address, level, version))
+                if result is not None:
+                    results[address] = result
+                    continue
+            addr, pref, city = normalize_until_city(
+                address, prefectures, level, self.endpoint, self.cache
+            )
+            address_parts[address] = (addr, pref, city)
+            groups.setdefault((pref, city), []).append(address)
+
+        # 町丁目以降の正規化（同じ市区町村の町丁目データを続けて利用する）
+        for group in groups.values():
+            for address in group:
+                addr, pref, city = address_parts[address]
+                results[address] = normalize_after_city(
+                    addr, pref, city, level, self.endpoint, self.cache
+                )
+                if use_result_cache:
+                    self.cache.set_result((self.endpoint, address, level, version), results[address])
+
+        return [results[address].copy() for address in addresses]
+
+    def get_data_version(self) -> Union[int, Tuple[int, str]]:
+        """
+        正規化した結果のキャッシュのキーに含める、住所データの番号
+        住所データファイルの場合は、作り直すと変わるファイルのバージョンも含める
+        """
+        if is_dataset_endpoint(self.endpoint):
+            return self.cache.version, open_dataset(self.endpoint).version
+        return self.cache.version
+
+    def result_cache_info(self) -> dict:
+        """
+        正規化した結果のキャッシュのヒット数・ミス数・件数・上限件数を返す
+        """
+        return self.cache.result_cache_info()
+
+    def preload(
+        self,
+        prefs: Optional[Iterable[str]] = None,
+        cities: Optional[Iterable[str]] = None,
+        workers: Optional[int] = None,
+        progress: Optional[ProgressCallback] = None,
+        compile_regexes: bool = True,
+    ) -> dict:
+        """
+        住所データを事前に読み込む
+        指定した都道府県・市区町村の町丁目データを並行して取得し、照合用のデータを作成する
+        :param prefs: 都道府県のリスト（省略時はすべての都道府県）
+        :param cities: 市区町村のリスト（省略時は対象の都道府県のすべての市区町村）
+        :param workers: 並行して読み込む数
+        :param progress: 市区町村を読み込むごとに (完了した数, 全体の数, 都道府県, 市区町村) で呼び出す関数
+        :param compile_regexes: 町丁目の正規表現もコンパイルするか（False の場合は初めて使うときにコンパイルする）
+        :return: 読み込んだ都道府県・市区町村・町丁目の件数、かかった時間（秒）、増えたメモリ使用量（バイト）
+        """
+        return preload_caches(
+            self.endpoint, self.cache, prefs, cities, workers, progress, compile_regexes
+        )
+
+
+def normalize(address: str, **kwargs) -> dict:
     """
     住所正規化
     :param address: 住所
-    :param kwargs: オプション（level:正規化レベル）
+    :param kwargs: オプション（level:正規化レベル, max_length:正規化する住所の最大の長さ）
     :return: 正規化後の住所
     """
+    return get_normalizer(kwargs).normalize(address)
+
+
+def normalize_many(addresses: Iterable[str], **kwargs) -> List[dict]:
+    """
+    住所の一括正規化
+    :param addresses: 住所のリスト
+    :param kwargs: オプション（level:正規化レベル, max_length:正規化する住所の最大の長さ）
+    :return: 正規化後の住所のリスト（入力順）
+    """
+    return get_normalizer(kwargs).normalize_many(addresses)
+
+
+def preload(
+    prefs: Optional[Iterable[str]] = None,
+    cities: Optional[Iterable[str]] = None,
+    workers: Optional[int] = None,
+    progress: Optional[ProgressCallback] = None,
+    compile_regexes: bool = True,
+    **kwargs,
+) -> dict:
+    """
+    住所データを事前に読み込む（normalize と同じキャッシュを使う）
+    :param kwargs: オプション（endpoint, ttl）
+    :return: 読み込んだ都道府県・市区町村・町丁目の件数、かかった時間（秒）、増えたメモリ使用量（バイト）
+    """
+    return get_normalizer(kwargs).preload(prefs, cities, workers, progress, compile_regexes)
+
+
+def result_cache_info() -> dict:
+    """
+    既定のキャッシュで、正規化した結果のキャッシュのヒット数・ミス数・件数・上限件数を返す
+    """
+    return default_cache.result_cache_info()
+
+
+def get_normalizer(options: dict) -> Normalizer:
+    """
+    オプションに応じた Normalizer を返す
+    キャッシュは既定のキャッシュ（ttl オプションを指定した場合はttlごとのキャッシュ）を共有する
+    """
+    level, endpoint, cache = set_options(options)
+    max_length = options.get("max_length", DEFAULT_MAX_LENGTH)
+    return Normalizer(endpoint=endpoint, level=level, cache=cache, max_length=max_length)
+
+
+def is_too_long(address: str, max_length: Optional[int]) -> bool:
+    """
+    住所が正規化する最大の長さを超えているかを返す
+    """
+    return max_length is not None and len(address) > max_length
+
+
+def get_unnormalized_result(address: str) -> dict:
+    """
+    正規化しない住所の結果（level 0 で、addr に住所をそのまま入れる）を返す
+    """
+    return {
+        "pref": "",
+        "city": "",
+        "town": "",
+        "addr": address,
+        "lat": None,
+        "lng": None,
+        "level": 0,
+    }
+
 
-    # オプションの設定
-    level, endpoint = set_options(kwargs)
+def normalize_until_city(
+    address: str,
+    prefectures: dict,
+    level: int,
+    endpoint: str,
+    cache: Optional[DatasetCache] = None,
+) -> Tuple[str, str, str]:
+    """
+    市区町村までの住所を正規化する
+    """
 
     # 初期設定
-    addr, pref, city, town, lat, lng, ref_level = get_address_parts(address)
+    addr, pref, city, _, _, _, _ = get_address_parts(address)
 
     # 住所の前処理
     addr = preprocessing_address(addr)
 
-    # 都道府県情報を取得
-    prefectures = get_prefectures(endpoint)
     prefectures_list: list = list(prefectures.keys())
 
     # 都道府県の正規化
@@ -52,23 +301,44 @@ def normalize(address: str, **kwargs) -> str:
         prefectures=prefectures,
         prefectures_list=prefectures_list,
         endpoint=endpoint,
+        cache=cache,
     )
 
     # 市区町村の正規化
     if pref != "" and level >= 2:
-        addr, city = normalize_city_names(addr=addr, prefectures=prefectures, pref=pref)
+        addr, city = normalize_city_names(
+            addr=addr, prefectures=prefectures, pref=pref, endpoint=endpoint, cache=cache
+        )
+
+    return addr, pref, city
+
+
+def normalize_after_city(
+    addr: str,
+    pref: str,
+    city: str,
+    level: int,
+    endpoint: str,
+    cache: Optional[DatasetCache] = None,
+) -> dict:
+    """
+    町丁目以降の住所を正規化し、正規化結果を返す
+    """
+    town: str = ""
+    lat: Optional[float] = None
+    lng: Optional[float] = None
 
     # 町丁目以降の正規化
     if city != "" and level >= 3:
         addr, town, lat, lng = normalize_after_town_names(
-            addr=addr, pref=pref, city=city, endpoint=endpoint
+            addr=addr, pref=pref, city=city, endpoint=endpoint, cache=cache
         )
 
     # 住所の後処理
     addr = patch_addr(pref, city, town, addr)
 
     # 戻り値のレベルを設定
-    ref_level = set_level(pref, city, town, ref_level)
+    ref_level = set_level(pref, city, town, 0)
 
     return {
         "pref": pref,
@@ -84,13 +354,15 @@ def normalize(address: str, **kwargs) -> str:
 def set_options(options: dict) -> tuple:
     """
     オプションの設定
+    ttl を指定した場合は、既定のキャッシュを置き換えずにttlごとのキャッシュを使う
     """
     level = options.get("level", DEFAULT_LEVEL)
     endpoint = options.get("endpoint", DEFAULT_ENDPOINT)
     option_ttl = options.get("ttl", None)
+    cache = default_cache
     if option_ttl is not None and isinstance(option_ttl, int):
-        set_ttl(option_ttl)
-    return level, endpoint
+        cache = get_ttl_cache(option_ttl)
+    return level, endpoint, cache
 
 
 def get_address_parts(
@@ -112,122 +384,165 @@ def get_address_parts(
     return addr, pref, city, town, lat, lng, ref_level
 
 
+# 前処理で半角に変換する文字（全角スペースと全角の英数字）
+PREPROCESSING_TABLE = {**ZENKAKU_TO_HANKAKU_TABLE, ord("　"): SPACE}
+
+SPACES_REGEX = re.compile(" {2,}")
+
+# 数字の前後にあるハイフンのような文字
+HYPHEN_LIKE_REGEX = re.compile(f"[{HYPHEN_CHARACTERS}]")
+HYPHEN_AROUND_DIGITS_REGEX = re.compile(
+    f"([0-9０-９一二三四五六七八九〇十百千][{HYPHEN_CHARACTERS}])|([{HYPHEN_CHARACTERS}])[0-9０-９一二三四五六七八九〇十]"
+)
+
+# 町丁目名の末尾（重なり合う候補もすべて見つけるため先読みで探す）
+TOWN_NAME_SUFFIX_REGEX = re.compile("(?=(丁目?|番[町地丁]|条|軒|線|[のノ]町|地割))")
+
+ARABIC_NUMERAL_HYPHEN_REGEX = re.compile("[0-9一二三四五六七八九〇十百千]-")
+
+
 def replace_spaces(addr: str) -> str:
     """
     全角スペースを半角スペースに置換する
     """
-    addr = addr.replace("　", SPACE).replace(" ", SPACE)
-    addr = re.sub(" +", SPACE, addr)
-    return addr
+    return SPACES_REGEX.sub(SPACE, addr.replace("　", SPACE))
 
 
 def replace_hyphen_like_characters_after_digits(addr: str) -> str:
     """
     数字の後にあるハイフンのような文字をハイフンに置換する
+    数字とハイフンの組み合わせを一度だけ探し、同じ組み合わせの箇所をまとめて置換する
     """
-    hyphen_iter = re.finditer(
-        "([0-9０-９一二三四五六七八九〇十百千][-－﹣−‐⁃‑‒–—﹘―⎯⏤ーｰ─━])|([-－﹣−‐⁃‑‒–—﹘―⎯⏤ーｰ─━])[0-9０-９一二三四五六七八九〇十]",
-        addr,
-    )
-    for m in hyphen_iter:
-        from_value = m.group()
-        replace_value = re.sub("[-－﹣−‐⁃‑‒–—﹘―⎯⏤ーｰ─━]", HYPHEN, from_value)
-        addr = addr.replace(from_value, replace_value)
+    pairs = {m.group() for m in HYPHEN_AROUND_DIGITS_REGEX.finditer(addr)}
+    if len(pairs) == 0:
+        return addr
+
+    def replace(m: re.Match) -> str:
+        index = m.start()
+        if (index > 0 and addr[index - 1:index + 1] in pairs) or addr[index:index + 2] in pairs:
+            return HYPHEN
+        return m.group()
+
+    return HYPHEN_LIKE_REGEX.sub(replace, addr)
+
+
+def remove_spaces_before(addr: str, find_end: Callable[[str], Optional[int]], first_only: bool = False) -> str:
+    """
+    各行の先頭から find_end が返す位置までのスペースを削除する
+    （削除する文字列と同じ文字列が他の箇所にある場合は、その箇所のスペースも削除する）
+    """
+    prefixes = []
+    for line in addr.split("\n"):
+        end = find_end(line)
+        if end is None:
+            continue
+        prefixes.append(line[:end])
+        if first_only:
+            break
+
+    for prefix in prefixes:
+        if SPACE in prefix:
+            addr = addr.replace(prefix, prefix.replace(SPACE, ""))
     return addr
 
 
+def find_town_name_suffix_end(line: str) -> Optional[int]:
+    """
+    2文字目以降で最後に出てくる町丁目名の末尾（丁目、番町、条など）の位置を返す
+    """
+    end = None
+    for m in TOWN_NAME_SUFFIX_REGEX.finditer(line, 1):
+        end = m.end(1)
+    return end
+
+
+def find_ward_or_gun_end(line: str) -> Optional[int]:
+    """
+    2文字目以降で最後に出てくる「郡〜町・村」「市〜区」の末尾の位置を返す
+    """
+    town = max(line.rfind("町"), line.rfind("村"))
+    ward = max(line.rfind("区"), line.rfind("區"))
+    gun = line.rfind("郡", 1, town - 1) if town > 2 else -1
+    city = max(line.rfind("市", 1, ward - 1), line.rfind("巿", 1, ward - 1)) if ward > 2 else -1
+    if gun < 0 and city < 0:
+        return None
+    return town + 1 if gun > city else ward + 1
+
+
+def find_first_arabic_numeral_end(line: str) -> Optional[int]:
+    """
+    2文字目以降で最初に出てくる「数字-」の末尾の位置を返す
+    """
+    m = ARABIC_NUMERAL_HYPHEN_REGEX.search(line, 1)
+    return None if m is None else m.end()
+
+
 def remove_spaces_before_town_city_district_name(addr: str) -> str:
     """
     町丁目名の前にあるスペースを削除する
     """
-    hyphen_iter = re.finditer("(.+)(丁目?|番([町地丁])|条|軒|線|([のノ])町|地割)", addr)
-    for m in hyphen_iter:
-        from_value = m.group()
-        replace_value = from_value.replace(SPACE, "")
-        addr = addr.replace(from_value, replace_value)
-    return addr
+    return remove_spaces_before(addr, find_town_name_suffix_end)
 
 
 def remove_spaces_before_ward_or_gun(addr: str) -> str:
     """
     区、郡以前のスペースは全て削除する
     """
-    hyphen_iter = re.finditer("(.+)((郡.+(町|村))|((市|巿).+(区|區)))", addr)
-    for m in hyphen_iter:
-        from_value = m.group()
-        replace_value = from_value.replace(SPACE, "")
-        addr = addr.replace(from_value, replace_value)
-    return addr
+    return remove_spaces_before(addr, find_ward_or_gun_end)
 
 
 def remove_leading_spaces_before_the_first_arabic_numeral(addr: str) -> str:
     """
     最初のアラビア数字の前にあるスペースを削除する
     """
-    hyphen_iter = re.finditer(".+?[0-9一二三四五六七八九〇十百千]-", addr)
-    for m in hyphen_iter:
-        from_value = m.group()
-        replace_value = from_value.replace(SPACE, "")
-        addr = addr.replace(from_value, replace_value)
-        break
-    return addr
+    return remove_spaces_before(addr, find_first_arabic_numeral_end, first_only=True)
 
 
 def preprocessing_address(addr: str) -> str:
     """
     住所の前処理
+    どの処理も住所を先頭から一度だけ走査するため、住所の長さに比例した時間で終わる
     """
 
-    # スペース変換
-    addr = replace_spaces(addr)
-
-    # 全角の英数字は半角に変換
-    addr = zenkaku_to_hankaku(addr)
+    # スペース変換と、全角の英数字の半角への変換
+    addr = SPACES_REGEX.sub(SPACE, addr.translate(PREPROCESSING_TABLE))
 
     # 数字の後に紐づくハイフン類似文字をすべて半角ハイフンに変換
     addr = replace_hyphen_like_characters_after_digits(addr)
 
-    # 町丁目名以前のスペースはすべて削除
-    addr = remove_spaces_before_town_city_district_name(addr)
+    if SPACE in addr:
+        # 町丁目名以前のスペースはすべて削除
+        addr = remove_spaces_before_town_city_district_name(addr)
 
-    # // 区、郡以前のスペースはすべて削除
-    addr = remove_spaces_before_ward_or_gun(addr)
+        # 区、郡以前のスペースはすべて削除
+        addr = remove_spaces_before_ward_or_gun(addr)
 
-    # 1番はじめに出てくるアラビア数字以前のスペースを削除
-    addr = remove_leading_spaces_before_the_first_arabic_numeral(addr)
+        # 1番はじめに出てくるアラビア数字以前のスペースを削除
+        addr = remove_leading_spaces_before_the_first_arabic_numeral(addr)
 
     return addr
 
 
 def normalize_prefecture_names(
-    addr: str, prefectures: dict, prefectures_list: list, endpoint: str
+    addr: str,
+    prefectures: dict,
+    prefectures_list: list,
+    endpoint: str,
+    cache: Optional[DatasetCache] = None,
 ) -> str:
     """
     都道府県名を正規化する
     """
     pref = ""
-    for _pref, reg in get_prefecture_regexes(prefectures_list, False):
-        if reg.match(addr):
-            pref = _pref
-            addr = addr[len(reg.match(addr)[0]) :]
-            break
+    match = get_prefecture_regex(prefectures_list, False).match(addr)
+    if match is not None:
+        pref = prefectures_list[match.lastindex - 1]
+        addr = addr[match.end() :]
 
     if pref == "":
         # 都道府県が省略されている
-        matched = []
-
-        for _pref, cities in prefectures.items():
-            addr = addr.strip()
-            for _city, reg in get_city_regexes(_pref, cities):
-                match = reg.match(addr)
-                if match is not None:
-                    matched.append(
-                        {
-                            "pref": _pref,
-                            "city": _city,
-                            "addr": addr[len(match.group()) :],
-                        }
-                    )
+        addr = addr.strip()
+        matched = match_cities_without_prefecture(addr, prefectures, endpoint, cache)
 
         # マッチする都道府県が複数ある場合は町名まで正規化して都道府県名を判別する。（例: 東京都府中市と広島県府中市など）
         if len(matched) == 1:
@@ -235,7 +550,7 @@ def normalize_prefecture_names(
         else:
             for match in matched:
                 normalized = normalize_town_name(
-                    match["addr"], match["pref"], match["city"], endpoint
+                    match["addr"], match["pref"], match["city"], endpoint, cache
                 )
 
                 if normalized is not None:
@@ -244,34 +559,56 @@ def normalize_prefecture_names(
 
     # 都道府県が省略されている場合に都道府県を抽出（誤検知防止のため、省略
     if pref == "":
-        for _pref, reg in get_prefecture_regexes(prefectures_list, True):
-            if reg.match(addr):
-                pref = _pref
-                addr = addr[len(reg.match(addr)[0]) :]
-                break
+        match = get_prefecture_regex(prefectures_list, True).match(addr)
+        if match is not None:
+            pref = prefectures_list[match.lastindex - 1]
+            addr = addr[match.end() :]
 
     return addr, pref
 
 
-def normalize_city_names(addr: str, prefectures: dict, pref: str) -> Tuple[str, str]:
+def match_cities_without_prefecture(
+    addr: str, prefectures: dict, endpoint: str, cache: Optional[DatasetCache] = None
+) -> list:
+    """
+    都道府県が省略された住所に一致する市区町村をすべて返す
+    """
+    matched = []
+
+    # 市区町村名の索引から候補を絞り込んでから照合する
+    for _pref, _city, end in match_city_names(addr, prefectures, endpoint, cache=cache):
+        matched.append(
+            {
+                "pref": _pref,
+                "city": _city,
+                "addr": addr[end:],
+            }
+        )
+    return matched
+
+
+def normalize_city_names(
+    addr: str,
+    prefectures: dict,
+    pref: str,
+    endpoint: str,
+    cache: Optional[DatasetCache] = None,
+) -> Tuple[str, str]:
     """
     市区町村名を正規化する
     """
     city = ""
-    cities = prefectures[pref]
 
-    for _city, reg in get_city_regexes(pref, cities):
-        match = reg.match(addr)
-        if match is not None:
-            city = _city
-            addr = addr[len(match.group()) :]
-            break
+    matched = match_city_names(addr, prefectures, endpoint, pref, cache)
+    if len(matched) > 0:
+        _, city, end = matched[0]
+        addr = addr[end:]
 
     return addr, city
 
 
 def normalize_after_town_names(
-    addr: str, pref: str, city: str, endpoint: str
+    addr: str, pref: str, city: str, endpoint: str, cache: Optional[DatasetCache] = None
 ) -> Tuple[str, str, float, float]:
     """
     町名以降の住所を正規化する
@@ -281,7 +618,7 @@ def normalize_after_town_names(
     lat = None
     lng = None
 
-    normalized = normalize_town_name(addr, pref, city, endpoint)
+    normalized = normalize_town_name(addr, pref, city, endpoint, cache)
     if normalized is not None:
         _town = normalized["town"]
         town = _town["originalTown"] if "originalTown" in _town else _town["town"]
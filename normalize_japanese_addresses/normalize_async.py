@@ -0,0 +1,189 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from .library.api import api_fetch_async
+from .library.dataset import is_dataset_endpoint
+from .library.regex import (
+    get_prefecture_regex,
+    get_prefectures,
+    get_towns,
+    get_prefectures_url,
+    get_cached_prefectures,
+    load_prefectures,
+    get_towns_url,
+    get_cached_towns,
+    load_towns,
+    DatasetCache,
+    default_cache,
+)
+from .normalize import (
+    set_options,
+    get_address_parts,
+    preprocessing_address,
+    match_cities_without_prefecture,
+    normalize_until_city,
+    normalize_after_city,
+    is_too_long,
+    get_unnormalized_result,
+    DEFAULT_MAX_LENGTH,
+)
+
+# URLを受け取り、レスポンスの本文を返す非同期関数
+AsyncTransport = Callable[[str], Awaitable[str]]
+
+# 照合処理を行うスレッド
+# 照合処理はGILを解放せずスレッドを増やしても速くならないため、1つのスレッドで順に処理する
+executor: Optional[ThreadPoolExecutor] = None
+
+# 取得中のURLごとのタスク（イベントループごとに管理する）
+tasks_in_flight: Dict[Tuple[asyncio.AbstractEventLoop, DatasetCache, str], asyncio.Task] = {}
+
+
+def get_executor() -> ThreadPoolExecutor:
+    global executor
+    if executor is None:
+        executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="normalize_async"
+        )
+    return executor
+
+
+async def run_in_executor(func: Callable, *args):
+    """
+    イベントループを止めないよう、照合処理を別スレッドで実行する
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), func, *args)
+
+
+async def normalize_async(address: str, **kwargs) -> dict:
+    """
+    住所正規化（非同期版）
+    :param address: 住所
+    :param kwargs: オプション（level:正規化レベル, transport:非同期トランスポート,
+                   max_length:正規化する住所の最大の長さ）
+    :return: 正規化後の住所
+    """
+
+    # オプションの設定
+    level, endpoint, cache = set_options(kwargs)
+    transport = kwargs.get("transport", api_fetch_async)
+    if is_too_long(address, kwargs.get("max_length", DEFAULT_MAX_LENGTH)):
+        return get_unnormalized_result(address)
+
+    # 都道府県情報を取得
+    prefectures = await get_prefectures_async(endpoint, transport, cache)
+
+    # 都道府県の判別に町丁目データが必要な場合は先に取得しておく
+    candidates = await run_in_executor(
+        find_prefecture_candidates, address, prefectures, endpoint, cache
+    )
+    await asyncio.gather(
+        *[
+            get_towns_async(pref, city, endpoint, transport, cache)
+            for pref, city in candidates
+        ]
+    )
+
+    # 市区町村までの正規化
+    addr, pref, city = await run_in_executor(
+        normalize_until_city, address, prefectures, level, endpoint, cache
+    )
+
+    # 町丁目以降の正規化
+    if city != "" and level >= 3:
+        await get_towns_async(pref, city, endpoint, transport, cache)
+    return await run_in_executor(
+        normalize_after_city, addr, pref, city, level, endpoint, cache
+    )
+
+
+async def get_prefectures_async(
+    endpoint: str,
+    transport: AsyncTransport = api_fetch_async,
+    cache: Optional[DatasetCache] = None,
+) -> dict:
+    """
+    都道府県情報を取得する（非同期版）
+    """
+    cache = cache or default_cache
+    if is_dataset_endpoint(endpoint):
+        # 住所データファイルは取得せずに読み込む
+        return await run_in_executor(get_prefectures, endpoint, cache)
+
+    prefectures = get_cached_prefectures(endpoint, cache)
+    if prefectures is None:
+        prefectures = await fetch_once_async(
+            get_prefectures_url(endpoint),
+            transport,
+            lambda text: load_prefectures(endpoint, text, cache),
+            cache,
+        )
+    return prefectures
+
+
+async def get_towns_async(
+    pref: str,
+    city: str,
+    endpoint: str,
+    transport: AsyncTransport = api_fetch_async,
+    cache: Optional[DatasetCache] = None,
+) -> list:
+    """
+    町丁目情報を取得する（非同期版）
+    """
+    cache = cache or default_cache
+    if is_dataset_endpoint(endpoint):
+        return await run_in_executor(get_towns, pref, city, endpoint, cache)
+
+    towns = get_cached_towns(pref, city, endpoint, cache)
+    if towns is None:
+        towns = await fetch_once_async(
+            get_towns_url(pref, city, endpoint),
+            transport,
+            lambda text: load_towns(pref, city, endpoint, text, cache),
+            cache,
+        )
+    return towns
+
+
+async def fetch_once_async(
+    url: str, transport: AsyncTransport, load: Callable[[str], Any], cache: DatasetCache
+) -> Any:
+    """
+    URLのデータを取得して読み込む
+    同じURLを複数のコルーチンが同時に取得しようとした場合は、1度だけ取得してその結果を共有する
+    """
+    loop = asyncio.get_running_loop()
+    key = (loop, cache, url)
+    task = tasks_in_flight.get(key)
+    if task is None:
+
+        async def fetch_and_load():
+            text = await transport(url)
+            return await run_in_executor(load, text)
+
+        task = loop.create_task(fetch_and_load())
+        tasks_in_flight[key] = task
+        task.add_done_callback(lambda _: tasks_in_flight.pop(key, None))
+
+    # 待っているコルーチンがキャンセルされても、取得は他のコルーチンのために続ける
+    return await asyncio.shield(task)
+
+
+def find_prefecture_candidates(
+    address: str, prefectures: dict, endpoint: str, cache: Optional[DatasetCache] = None
+) -> List[Tuple[str, str]]:
+    """
+    都道府県が省略された住所で、都道府県の判別に町丁目データが必要な市区町村を返す
+    （例: 東京都府中市と広島県府中市など）
+    """
+    addr = preprocessing_address(get_address_parts(address)[0])
+    if get_prefecture_regex(list(prefectures.keys()), False).match(addr) is not None:
+        return []
+
+    matched = match_cities_without_prefecture(addr.strip(), prefectures, endpoint, cache)
+    if len(matched) <= 1:
+        return []
+    return [(match["pref"], match["city"]) for match in matched]
@@ -0,0 +1,135 @@
+import itertools
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator, List, Optional
+
+from .library.regex import DatasetCache, default_cache, get_ttl_cache
+from .normalize import normalize_many, DEFAULT_ENDPOINT, DEFAULT_LEVEL, DEFAULT_MAX_LENGTH
+from .preload import preload_caches
+
+# 1プロセスに一度に渡す住所の件数
+DEFAULT_CHUNKSIZE = 1000
+
+
+def get_cache(ttl: Optional[int]) -> DatasetCache:
+    return get_ttl_cache(ttl) if ttl is not None else default_cache
+
+
+def warm_caches(
+    endpoint: str,
+    ttl: Optional[int] = None,
+    prefs: Optional[List[str]] = None,
+    cities: Optional[List[str]] = None,
+) -> None:
+    """
+    都道府県・市区町村の辞書と、指定した市区町村の町丁目の辞書を事前に読み込んでおく
+    prefs・cities をどちらも省略した場合は、町丁目の辞書は読み込まない（使うときに読み込む）
+    町丁目の正規表現は、各ワーカープロセスで使うものだけを初めて使うときにコンパイルする
+    """
+    if prefs is None and cities is None:
+        prefs = []
+    preload_caches(endpoint, get_cache(ttl), prefs, cities, compile_regexes=False)
+
+
+def normalize_chunk(
+    addresses: List[str],
+    level: int,
+    endpoint: str,
+    max_length: Optional[int] = DEFAULT_MAX_LENGTH,
+    ttl: Optional[int] = None,
+) -> List[dict]:
+    """
+    ワーカープロセスで住所のまとまりを正規化する
+    """
+    return normalize_many(addresses, level=level, endpoint=endpoint, max_length=max_length, ttl=ttl)
+
+
+class ParallelNormalizer:
+    """
+    複数のプロセスで住所を正規化する
+
+    with ParallelNormalizer(workers=4) as normalizer:
+        results = normalizer.normalize_many(addresses)
+    """
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        chunksize: int = DEFAULT_CHUNKSIZE,
+        **kwargs,
+    ):
+        """
+        :param workers: プロセス数（省略時はCPU数）
+        :param chunksize: 1プロセスに一度に渡す住所の件数
+        :param kwargs: オプション（level:正規化レベル, endpoint, ttl, max_length:正規化する住所の最大の長さ,
+                       prefs, cities:町丁目の辞書を事前に読み込む都道府県・市区町村（省略時は読み込まない））
+        """
+        self.chunksize = chunksize
+        self.level = kwargs.get("level", DEFAULT_LEVEL)
+        self.endpoint = kwargs.get("endpoint", DEFAULT_ENDPOINT)
+        self.max_length = kwargs.get("max_length", DEFAULT_MAX_LENGTH)
+        ttl = kwargs.get("ttl", None)
+        self.ttl = ttl if isinstance(ttl, int) else None
+        prefs = kwargs.get("prefs", None)
+        cities = kwargs.get("cities", None)
+        prefs = list(prefs) if prefs is not None else None
+        cities = list(cities) if cities is not None else None
+
+        self.workers = workers or os.cpu_count() or 1
+        mp_context = multiprocessing.get_context()
+        if mp_context.get_start_method() == "fork":
+            # fork で起動したワーカープロセスは親プロセスのキャッシュを引き継ぐため、親プロセスで1度だけ読み込む
+            warm_caches(self.endpoint, self.ttl, prefs, cities)
+            self.executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=mp_context)
+        else:
+            # それ以外の場合はキャッシュを引き継がないため、各ワーカープロセスで読み込む
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=mp_context,
+                initializer=warm_caches,
+                initargs=(self.endpoint, self.ttl, prefs, cities),
+            )
+
+    def __enter__(self) -> "ParallelNormalizer":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.executor.shutdown()
+
+    def imap(self, addresses: Iterable[str]) -> Iterator[dict]:
+        """
+        住所を順に読み込みながら正規化し、入力順に結果を返す
+        処理中のまとまりの数を制限するため、大量の住所でもメモリ使用量は一定になる
+        """
+        addresses = iter(addresses)
+        max_pending = self.workers * 2
+        pending = deque()
+
+        while True:
+            while len(pending) < max_pending:
+                chunk = list(itertools.islice(addresses, self.chunksize))
+                if len(chunk) == 0:
+                    break
+                pending.append(
+                    self.executor.submit(
+                        normalize_chunk, chunk, self.level, self.endpoint, self.max_length, self.ttl
+                    )
+                )
+
+            if len(pending) == 0:
+                return
+
+            yield from pending.popleft().result()
+
+    def normalize_many(self, addresses: Iterable[str]) -> List[dict]:
+        """
+        住所の一括正規化
+        :param addresses: 住所のリスト
+        :return: 正規化後の住所のリスト（入力順）
+        """
+        return list(self.imap(addresses))
@@ -0,0 +1,124 @@
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, List, Optional, Tuple
+
+from .library.regex import (
+    DatasetCache,
+    get_prefectures,
+    get_city_index,
+    get_towns,
+    get_town_matcher,
+)
+
+# preload の進捗を受け取る関数（完了した市区町村の数, 市区町村の数, 都道府県, 市区町村）
+ProgressCallback = Callable[[int, int, str, str], None]
+
+
+def get_memory_usage() -> Optional[int]:
+    """
+    プロセスのメモリ使用量（バイト）を返す
+    Linux では現在の使用量、その他の環境では最大の使用量を返す（取得できない場合は None）
+    """
+    try:
+        with open("/proc/self/statm") as fp:
+            return int(fp.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+
+    try:
+        import resource
+    except ImportError:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS はバイト、それ以外はキロバイト
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+def select_cities(
+    prefectures: dict,
+    prefs: Optional[Iterable[str]] = None,
+    cities: Optional[Iterable[str]] = None,
+) -> List[Tuple[str, str]]:
+    """
+    読み込む市区町村を (都道府県, 市区町村) の一覧で返す
+    :param prefs: 都道府県（省略時はすべての都道府県）
+    :param cities: 市区町村（省略時は対象の都道府県のすべての市区町村）
+    """
+    if prefs is None:
+        prefs = list(prefectures.keys())
+    else:
+        prefs = list(prefs)
+        unknown = [pref for pref in prefs if pref not in prefectures]
+        if len(unknown) > 0:
+            raise ValueError(f"Unknown prefectures: {', '.join(unknown)}")
+
+    selected = [(pref, city) for pref in prefs for city in prefectures[pref]]
+    if cities is None:
+        return selected
+
+    cities = set(cities)
+    unknown = cities - {city for _, city in selected}
+    if len(unknown) > 0:
+        raise ValueError(f"Unknown cities: {', '.join(sorted(unknown))}")
+    return [(pref, city) for pref, city in selected if city in cities]
+
+
+def preload_caches(
+    endpoint: str,
+    cache: DatasetCache,
+    prefs: Optional[Iterable[str]] = None,
+    cities: Optional[Iterable[str]] = None,
+    workers: Optional[int] = None,
+    progress: Optional[ProgressCallback] = None,
+    compile_regexes: bool = True,
+) -> dict:
+    """
+    都道府県・市区町村の辞書と、指定した市区町村の町丁目データ・照合用のトライ木を並行して読み込む
+    読み込んだデータが追い出されないよう、キャッシュの上限件数は市区町村の数に合わせて増やす
+    :param compile_regexes: 町丁目の正規表現もコンパイルするか（False の場合は初めて使うときにコンパイルする）
+    :return: 読み込んだ都道府県・市区町村・町丁目の件数、かかった時間（秒）、増えたメモリ使用量（バイト）
+    """
+    started = time.perf_counter()
+    memory_before = get_memory_usage()
+
+    prefectures = get_prefectures(endpoint, cache)
+    get_city_index(prefectures, endpoint, cache)
+    selected = select_cities(prefectures, prefs, cities)
+    # 市区町村ごとの町丁目データと、都道府県・市区町村の辞書の分
+    cache.reserve(len(selected) + 1)
+
+    lock = threading.Lock()
+    done = 0
+
+    def load(pref: str, city: str) -> int:
+        nonlocal done
+        town_regexes, _ = get_town_matcher(pref, city, endpoint, cache)
+        if compile_regexes:
+            # 町丁目の正規表現は初めて使うときにコンパイルされるため、ここでコンパイルしておく
+            for _, regex, _, _ in town_regexes:
+                regex.get()
+        town_count = len(get_towns(pref, city, endpoint, cache))
+        if progress is not None:
+            with lock:
+                done += 1
+                progress(done, len(selected), pref, city)
+        return town_count
+
+    with ThreadPoolExecutor(max_workers=workers or min(32, (os.cpu_count() or 1) + 4)) as executor:
+        town_counts = list(executor.map(load, *zip(*selected))) if len(selected) > 0 else []
+
+    memory_after = get_memory_usage()
+    return {
+        "prefectures": len({pref for pref, _ in selected}),
+        "cities": len(selected),
+        "towns": sum(town_counts),
+        "seconds": time.perf_counter() - started,
+        "memory": (
+            memory_after - memory_before
+            if memory_before is not None and memory_after is not None
+            else None
+        ),
+    }
@@ -31,5 +31,14 @@ setup(
         "kanjize",
         "cachetools"
     ],
+    entry_points={
+        "console_scripts": [
+            "normalize-japanese-addresses = normalize_japanese_addresses.cli:main",
+        ],
+    },
+    extras_require={
+        "zstd": ["zstandard"],
+        "pandas": ["pandas", "numpy"],
+    },
     python_requires=">=3.8",
 )
@@ -0,0 +1,125 @@
+import json
+import threading
+import time
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+# テスト用の住所データ（@geolonia/japanese-addresses の一部）
+PREFECTURES = {
+    "北海道": ["札幌市中央区", "札幌市西区"],
+    "東京都": ["文京区", "府中市"],
+    "大阪府": ["大阪市中央区", "堺市北区"],
+    "和歌山県": ["東牟婁郡串本町"],
+    "広島県": ["府中市"],
+}
+
+TOWNS = {
+    ("北海道", "札幌市中央区"): [
+        {"town": "宮の森四条十丁目", "koaza": "", "lat": 43.060356, "lng": 141.298776},
+    ],
+    ("北海道", "札幌市西区"): [
+        {"town": "二十四軒二条二丁目", "koaza": "", "lat": 43.074273, "lng": 141.315099},
+    ],
+    ("東京都", "文京区"): [
+        {"town": "千石四丁目", "koaza": "", "lat": 35.729052, "lng": 139.740683},
+    ],
+    ("東京都", "府中市"): [
+        {"town": "宮町一丁目", "koaza": "", "lat": 35.669937, "lng": 139.479181},
+    ],
+    ("大阪府", "大阪市中央区"): [
+        {"town": "大手前二丁目", "koaza": "", "lat": 34.687006, "lng": 135.519317},
+    ],
+    ("大阪府", "堺市北区"): [
+        {"town": "新金岡町四丁", "koaza": "", "lat": 34.568184, "lng": 135.519409},
+    ],
+    ("和歌山県", "東牟婁郡串本町"): [
+        {"town": "串本", "koaza": "", "lat": 33.470358, "lng": 135.779952},
+        {"town": "鬮野川", "koaza": "", "lat": 33.493026, "lng": 135.784941},
+        {"town": "田並", "koaza": "", "lat": 33.48681, "lng": 135.717844},
+    ],
+    ("広島県", "府中市"): [
+        {"town": "府川町", "koaza": "", "lat": 34.566667, "lng": 133.236111},
+    ],
+}
+
+
+def write_dataset(root) -> None:
+    """
+    住所データを japanese-addresses の api/ja と同じ構成で書き出す
+    """
+    api_dir = root / "api"
+    (api_dir / "ja").mkdir(parents=True)
+    (api_dir / "ja.json").write_text(json.dumps(PREFECTURES, ensure_ascii=False), encoding="utf-8")
+    for (pref, city), towns in TOWNS.items():
+        pref_dir = api_dir / "ja" / pref
+        pref_dir.mkdir(exist_ok=True)
+        (pref_dir / f"{city}.json").write_text(json.dumps(towns, ensure_ascii=False), encoding="utf-8")
+
+
+@pytest.fixture(scope="session")
+def local_endpoint(tmp_path_factory) -> str:
+    """
+    ローカルに書き出した住所データの endpoint
+    """
+    root = tmp_path_factory.mktemp("japanese-addresses")
+    write_dataset(root)
+    return f"file://{root}/api/ja"
+
+
+class QuietHTTPRequestHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture(scope="session")
+def http_endpoint(tmp_path_factory) -> str:
+    """
+    ローカルのHTTPサーバーから配信する住所データの endpoint
+    """
+    root = tmp_path_factory.mktemp("japanese-addresses-http")
+    write_dataset(root)
+    server = ThreadingHTTPServer(
+        ("127.0.0.1", 0), partial(QuietHTTPRequestHandler, directory=str(root))
+    )
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/api/ja"
+    server.shutdown()
+    server.server_close()
+
+
+def measure_time(func, value, min_time: float = 0.02, repeat: int = 3) -> float:
+    """
+    func(value) の1回あたりの時間を返す
+    計測の誤差を抑えるため、合計が min_time 秒以上になるまで繰り返し、repeat 回のうち最短の時間を使う
+    """
+    elapsed = []
+    for _ in range(repeat):
+        count = 0
+        started = time.perf_counter()
+        while True:
+            func(value)
+            count += 1
+            seconds = time.perf_counter() - started
+            if seconds >= min_time:
+                break
+        elapsed.append(seconds / count)
+    return min(elapsed)
+
+
+@pytest.fixture
+def assert_linear_time():
+    """
+    入力を scale 倍に長くしたときの時間の増え方が、長さに比例する範囲に収まることを確認する関数
+    実行環境の速さに左右されないよう、時間そのものではなく2つの長さの時間の比で判定する
+    （長さに比例する場合は scale 倍、2乗に比例する場合は scale の2乗倍になる）
+    """
+
+    def check(func, make, size: int, scale: int = 8) -> None:
+        short = measure_time(func, make(size))
+        long = measure_time(func, make(size * scale))
+        assert long / short < scale * 3, f"x{long / short:.1f} for x{scale} input ({make(1)!r})"
+
+    return check
@@ -0,0 +1,201 @@
+import gzip
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+import pytest
+import requests
+
+from normalize_japanese_addresses import normalize, Normalizer
+from normalize_japanese_addresses.library.api import (
+    Transport,
+    api_fetch,
+    default_transport,
+    get_transport,
+    set_transport,
+)
+
+
+class StubServer(ThreadingHTTPServer):
+    """
+    テスト用のHTTPサーバー
+    接続数・リクエスト数・同時に処理したリクエスト数の最大値を記録する
+    """
+    daemon_threads = True
+
+    def __init__(self, responses=None, delay=0.0):
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        self.responses = list(responses or [])
+        self.delay = delay
+        self.connections = 0
+        self.requests = 0
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+
+    @property
+    def endpoint(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/api/ja"
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_GET(self):
+        with self.server.lock:
+            self.server.requests += 1
+            self.server.active += 1
+            self.server.max_active = max(self.server.max_active, self.server.active)
+            status = self.server.responses.pop(0) if self.server.responses else 200
+        time.sleep(self.server.delay)
+        with self.server.lock:
+            self.server.active -= 1
+
+        body = b'{"path": "ok"}'
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    servers = []
+
+    def start(**kwargs) -> StubServer:
+        server = StubServer(**kwargs)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def test_transport_0001(stub_server):
+    """
+    同じ endpoint への取得で接続が使い回されることを確認
+    """
+    server = stub_server()
+    transport = Transport()
+    for index in range(5):
+        assert transport.get(f"{server.endpoint}/{index}.json").json() == {"path": "ok"}
+    transport.close()
+    assert server.requests == 5
+    assert server.connections == 1
+
+
+def test_transport_0002(stub_server):
+    """
+    5xx エラーの場合に再試行されることを確認
+    """
+    server = stub_server(responses=[503, 503])
+    transport = Transport(retries=3, backoff_factor=0)
+    assert transport.get(f"{server.endpoint}.json").status_code == 200
+    assert server.requests == 3
+
+    # 再試行回数を超えた場合は最後のレスポンスを返す
+    server = stub_server(responses=[503, 503])
+    transport = Transport(retries=1, backoff_factor=0)
+    assert transport.get(f"{server.endpoint}.json").status_code == 503
+    assert server.requests == 2
+
+
+def test_transport_0003(stub_server):
+    """
+    応答がない場合に読み込みのタイムアウトでエラーになることを確認
+    """
+    server = stub_server(delay=2.0)
+    transport = Transport(read_timeout=0.2, retries=0)
+    # 応答を待たずに、読み込みのタイムアウトでエラーになる
+    with pytest.raises(requests.exceptions.ConnectionError, match="Read timed out"):
+        transport.get(f"{server.endpoint}.json")
+    assert server.requests == 1
+
+
+def test_transport_0004(stub_server):
+    """
+    同時接続数が上限を超えないことを確認
+    """
+    server = stub_server(delay=0.1)
+    transport = Transport(max_connections=2)
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(lambda index: transport.get(f"{server.endpoint}/{index}.json"), range(8)))
+    assert server.requests == 8
+    assert server.max_active == 2
+
+
+def test_transport_0005(http_endpoint):
+    """
+    endpoint ごとに設定した Transport が使われることを確認
+    """
+    transport = Transport(read_timeout=10)
+    set_transport(http_endpoint, transport)
+    try:
+        assert get_transport(f"{http_endpoint}/大阪府/堺市北区.json") is transport
+        assert get_transport("https://example.com/api/ja.json") is default_transport
+        assert api_fetch(f"{http_endpoint}.json").json()["広島県"] == ["府中市"]
+        assert normalize('広島県府中市府川町315', endpoint=http_endpoint)["town"] == "府川町"
+    finally:
+        set_transport(http_endpoint, None)
+    assert get_transport(f"{http_endpoint}.json") is default_transport
+
+
+def compress_tree(root, compress, suffix: str) -> None:
+    for path in list(root.rglob("*.json")):
+        path.with_name(path.name + suffix).write_bytes(compress(path.read_bytes()))
+        path.unlink()
+
+
+def test_api_fetch_0001(local_endpoint, tmp_path):
+    """
+    gzip で圧縮したファイルを展開して読み込むことを確認
+    """
+    shutil.copytree(local_endpoint.replace("file://", "").replace("/api/ja", "/api"), tmp_path / "api")
+    compress_tree(tmp_path / "api", gzip.compress, ".gz")
+    endpoint = f"file://{tmp_path}/api/ja"
+
+    assert api_fetch(f"{endpoint}.json").json()["広島県"] == ["府中市"]
+    assert Normalizer(endpoint=endpoint).normalize('広島県府中市府川町315') == \
+           normalize('広島県府中市府川町315', endpoint=local_endpoint)
+
+    # 圧縮したファイルも変更がなければ 304 を返す
+    etag = api_fetch(f"{endpoint}.json").headers["ETag"]
+    assert api_fetch(f"{endpoint}.json", headers={"If-None-Match": etag}).status_code == 304
+
+    # 展開したファイルは読み込んだ後に閉じる
+    streams = []
+
+    def open_gzip(fp):
+        streams.append(gzip.GzipFile(fileobj=fp))
+        return streams[-1]
+
+    with patch('normalize_japanese_addresses.library.api.COMPRESSED_SUFFIXES', ((".gz", open_gzip),)):
+        api_fetch(f"{endpoint}.json")
+    assert len(streams) == 1 and streams[0].closed
+
+
+def test_api_fetch_0002(local_endpoint, tmp_path):
+    """
+    zstd で圧縮したファイルを展開して読み込むことを確認
+    """
+    zstandard = pytest.importorskip("zstandard")
+    shutil.copytree(local_endpoint.replace("file://", "").replace("/api/ja", "/api"), tmp_path / "api")
+    compress_tree(tmp_path / "api", zstandard.ZstdCompressor().compress, ".zst")
+    endpoint = f"file://{tmp_path}/api/ja"
+
+    assert Normalizer(endpoint=endpoint).normalize('広島県府中市府川町315')["town"] == "府川町"
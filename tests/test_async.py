@@ -0,0 +1,75 @@
+import asyncio
+
+from normalize_japanese_addresses import normalize, normalize_async
+from normalize_japanese_addresses.library.api import api_fetch_async
+from normalize_japanese_addresses.library.regex import set_ttl
+
+ADDRESSES = [
+    '大阪府堺市北区新金岡町4丁1−8',
+    '和歌山県串本町串本1234',
+    '北海道札幌市西区24-2-2-3-3',
+    '府中市宮町1-1',
+    '府中市府川町315',
+    '東京都文京区千石4丁目15-7',
+    '住所ではない文字列',
+]
+
+
+def test_normalize_async_0001(local_endpoint, http_endpoint):
+    """
+    HTTPサーバーから取得した場合も同期版と同じ結果になることを確認
+    """
+    async def main():
+        return await asyncio.gather(
+            *[normalize_async(address, endpoint=http_endpoint) for address in ADDRESSES]
+        )
+
+    results = asyncio.run(main())
+    assert results == [normalize(address, endpoint=local_endpoint) for address in ADDRESSES]
+
+
+def test_normalize_async_0002(http_endpoint):
+    """
+    transport オプションで指定した非同期関数から住所データを取得することを確認
+    """
+    set_ttl(60)
+    urls = []
+
+    async def transport(url: str) -> str:
+        urls.append(url)
+        return await api_fetch_async(url)
+
+    # 他のテストでキャッシュされていない endpoint を使う
+    endpoint = http_endpoint.replace("127.0.0.1", "localhost")
+    result = asyncio.run(normalize_async('府中市府川町315', endpoint=endpoint, transport=transport))
+    assert result == {"pref": "広島県", "city": "府中市", "town": "府川町", "addr": "315",
+                      "lat": 34.566667, "lng": 133.236111, "level": 3}
+    # 都道府県の判別に使う府中市の町丁目データは、それぞれ一度だけ取得する
+    assert sorted(urls) == sorted([
+        f"{endpoint}.json",
+        f"{endpoint}/%E6%9D%B1%E4%BA%AC%E9%83%BD/%E5%BA%9C%E4%B8%AD%E5%B8%82.json",
+        f"{endpoint}/%E5%BA%83%E5%B3%B6%E7%9C%8C/%E5%BA%9C%E4%B8%AD%E5%B8%82.json",
+    ])
+
+
+def test_normalize_async_0003(http_endpoint):
+    """
+    同じ住所データを複数のコルーチンが同時に取得しても、1度だけ取得されることを確認
+    """
+    set_ttl(60)
+    urls = []
+
+    async def transport(url: str) -> str:
+        urls.append(url)
+        await asyncio.sleep(0.1)
+        return await api_fetch_async(url)
+
+    async def main():
+        return await asyncio.gather(
+            *[normalize_async('大阪府堺市北区新金岡町4丁1−8', endpoint=http_endpoint, transport=transport)
+              for _ in range(20)]
+        )
+
+    results = asyncio.run(main())
+    assert all(result == results[0] for result in results)
+    assert len(urls) == 2
@@ -0,0 +1,47 @@
+from normalize_japanese_addresses import normalize, normalize_many
+
+ADDRESSES = [
+    '大阪府堺市北区新金岡町4丁1−8',
+    '和歌山県串本町串本1234',
+    '北海道札幌市西区24-2-2-3-3',
+    '大阪府堺市北区新金岡町４丁１ー８',
+    '府中市宮町1-1',
+    '和歌山県東牟婁郡串本町くじ野川一二三四',
+    '大阪府堺市北区新金岡町4丁1−8',
+    '東京都文京区千石4丁目15-7',
+    '住所ではない文字列',
+    '',
+]
+
+
+def test_normalize_many_0001(local_endpoint):
+    """
+    1件ずつ正規化した場合と同じ結果が入力順に返ることを確認
+    """
+    results = normalize_many(ADDRESSES, endpoint=local_endpoint)
+    assert results == [normalize(address, endpoint=local_endpoint) for address in ADDRESSES]
+
+
+def test_normalize_many_0002(local_endpoint):
+    """
+    オプションが1件ずつ正規化した場合と同様に適用されることを確認
+    """
+    results = normalize_many(iter(ADDRESSES), endpoint=local_endpoint, level=2)
+    assert results == [normalize(address, endpoint=local_endpoint, level=2) for address in ADDRESSES]
+    assert results[0] == {"pref": "大阪府", "city": "堺市北区", "town": "", "addr": "新金岡町4丁1-8",
+                          "lat": None, "lng": None, "level": 2}
+
+
+def test_normalize_many_0003(local_endpoint):
+    """
+    同じ住所の結果はそれぞれ別のオブジェクトとして返ることを確認
+    """
+    results = normalize_many(ADDRESSES, endpoint=local_endpoint)
+    assert results[0] == results[6]
+    assert results[0] is not results[6]
+    assert results[0]["town"] == "新金岡町四丁"
+    assert results[4]["pref"] == "東京都"
+
+
+def test_normalize_many_0004(local_endpoint):
+    assert normalize_many([], endpoint=local_endpoint) == []
@@ -1,11 +1,29 @@
-from normalize_japanese_addresses import normalize
+from normalize_japanese_addresses import normalize, Normalizer
 from normalize_japanese_addresses.normalize import get_prefectures, DEFAULT_ENDPOINT
-from normalize_japanese_addresses.library.regex import set_ttl, clear_cache_of_cities, cache_cities, get_towns
+from normalize_japanese_addresses.library.regex import (
+    set_ttl,
+    clear_cache_of_cities,
+    default_cache,
+    ttl_caches,
+    MAX_TTL_CACHES,
+    get_towns,
+    get_towns_url,
+    get_town_regexes,
+    normalize_town_name,
+)
+from normalize_japanese_addresses.library.api import api_fetch
+from normalize_japanese_addresses.library.disk_cache import DiskCache
 from unittest.mock import patch, MagicMock
 
 import json
+import multiprocessing
+import shutil
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from time import sleep
 
+import pytest
+
 
 def test_normalize_cache_0001():
     """
@@ -14,31 +32,25 @@ def test_normalize_cache_0001():
     
     # キャッシュをクリア
     clear_cache_of_cities()
-    assert len(cache_cities) == 0
+    assert len(default_cache.city_regexes) == 0
 
     # 住所正規化でキャッシュが有効になることを確認
     normalize('大阪府堺市北区新金岡町4丁1−8') 
-    assert len(cache_cities) != 0
+    assert len(default_cache.city_regexes) != 0
 
-    # キャッシュ時間を保存
-    cities_key = cache_cities.keys()
+    # キャッシュした正規表現を保存
+    cities_key = default_cache.city_regexes.keys()
     key_city_0 = list(cities_key)[0]
-    cache_cities_ttl_before = cache_cities[key_city_0][1]
+    cache_cities_before = default_cache.city_regexes[key_city_0]
 
     # キャッシュを利用していることを確認
     normalize('大阪府堺市北区新金岡町4丁1−8') 
-    cities_key = cache_cities.keys()
-    key_city_0 = list(cities_key)[0]
-    cache_cities_ttl_after = cache_cities[key_city_0][1]
-    assert cache_cities_ttl_before == cache_cities_ttl_after
+    assert default_cache.city_regexes[key_city_0] is cache_cities_before
 
     # キャッシュ時間を0にして、キャッシュが利用されないことを確認
     set_ttl(0)
     normalize('大阪府堺市北区新金岡町4丁1−8') 
-    cities_key = cache_cities.keys()
-    key_city_0 = list(cities_key)[0]
-    cache_cities_ttl_after = cache_cities[key_city_0][1]
-    assert cache_cities_ttl_before != cache_cities_ttl_after
+    assert len(default_cache.city_regexes) == 0
 
 
 @patch('normalize_japanese_addresses.library.regex.api_fetch')
@@ -125,4 +137,337 @@ def test_normalize_cache_0003(mock_api_fetch):
     result_towns = get_towns(prefecture, city, DEFAULT_ENDPOINT)
     assert json.loads(mock_text1) != result_towns
     assert json.loads(mock_text2) == result_towns
-    
\ No newline at end of file
+    
+
+@patch('normalize_japanese_addresses.library.regex.api_fetch')
+def test_normalize_cache_0004(mock_api_fetch):
+    """
+    コンパイル済みの町の正規表現がキャッシュされていることを確認
+    また、TTLが有効になっていることを確認
+    """
+    mock_response = MagicMock()
+    mock_response.text = '[{"town":"奥本町一丁","koaza":"","lat":34.581061,"lng":135.510333}]'
+    mock_api_fetch.return_value = mock_response
+
+    prefecture = '大阪府'
+    city = '堺市北区'
+
+    set_ttl(60)
+
+    with patch(
+        'normalize_japanese_addresses.library.regex.get_town_regexes',
+        wraps=get_town_regexes,
+    ) as mock_get_town_regexes:
+        # 初回の呼び出しでは正規表現が生成される
+        result = normalize_town_name('奥本町一丁1', prefecture, city, DEFAULT_ENDPOINT)
+        assert result['town'] == {'town': '奥本町一丁'}
+        assert mock_get_town_regexes.call_count == 1
+
+        # 再度呼び出すと、コンパイル済みの正規表現が利用される
+        result = normalize_town_name('奥本町一丁2', prefecture, city, DEFAULT_ENDPOINT)
+        assert result['addr'] == '2'
+        assert mock_get_town_regexes.call_count == 1
+
+        # ttlを0にすると、キャッシュが有効にならず正規表現が再生成される
+        set_ttl(0)
+        normalize_town_name('奥本町一丁1', prefecture, city, DEFAULT_ENDPOINT)
+        normalize_town_name('奥本町一丁1', prefecture, city, DEFAULT_ENDPOINT)
+        assert mock_get_town_regexes.call_count == 3
+
+
+def fetch_concurrently(mock_api_fetch, func, threads=50):
+    """
+    api_fetch を遅延させた状態で、複数のスレッドから同時に func を呼び出す
+    """
+    barrier = threading.Barrier(threads)
+
+    def slow_fetch(endpoint, headers=None):
+        sleep(0.2)
+        mock_response = MagicMock()
+        mock_response.text = '[{"town":"奥本町一丁","koaza":"","lat":34.581061,"lng":135.510333}]'
+        return mock_response
+
+    mock_api_fetch.side_effect = slow_fetch
+
+    def run():
+        barrier.wait()
+        return func()
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        futures = [executor.submit(run) for _ in range(threads)]
+        return [future.result() for future in futures]
+
+
+@patch('normalize_japanese_addresses.library.regex.api_fetch')
+def test_normalize_cache_0005(mock_api_fetch):
+    """
+    同じ町丁目データを複数のスレッドが同時に取得しても、api_fetchが1度だけ呼ばれることを確認
+    """
+    set_ttl(60)
+
+    results = fetch_concurrently(mock_api_fetch, lambda: get_towns('大阪府', '堺市北区', DEFAULT_ENDPOINT))
+    assert mock_api_fetch.call_count == 1
+    assert all(result is results[0] for result in results)
+
+    # 取得後はキャッシュから返される
+    get_towns('大阪府', '堺市北区', DEFAULT_ENDPOINT)
+    assert mock_api_fetch.call_count == 1
+
+
+@patch('normalize_japanese_addresses.library.regex.api_fetch')
+def test_normalize_cache_0006(mock_api_fetch):
+    """
+    都道府県データを複数のスレッドが同時に取得しても、api_fetchが1度だけ呼ばれることを確認
+    """
+    set_ttl(60)
+
+    results = fetch_concurrently(mock_api_fetch, lambda: get_prefectures(DEFAULT_ENDPOINT))
+    assert mock_api_fetch.call_count == 1
+    assert all(result is results[0] for result in results)
+
+
+@patch('normalize_japanese_addresses.library.regex.api_fetch')
+def test_normalize_cache_0007(mock_api_fetch):
+    """
+    取得に失敗した場合は待っていたスレッドにも例外が伝わり、次の呼び出しで再度取得されることを確認
+    """
+    set_ttl(60)
+    barrier = threading.Barrier(10)
+
+    def failing_fetch(endpoint, headers=None):
+        sleep(0.2)
+        raise ConnectionError("dummy")
+
+    mock_api_fetch.side_effect = failing_fetch
+
+    def run():
+        barrier.wait()
+        try:
+            get_towns('大阪府', '堺市北区', DEFAULT_ENDPOINT)
+        except ConnectionError:
+            return True
+        return False
+
+    with ThreadPoolExecutor(max_workers=10) as executor:
+        assert all(executor.map(lambda _: run(), range(10)))
+    assert mock_api_fetch.call_count == 1
+
+    mock_response = MagicMock()
+    mock_response.text = '[]'
+    mock_api_fetch.side_effect = None
+    mock_api_fetch.return_value = mock_response
+    assert get_towns('大阪府', '堺市北区', DEFAULT_ENDPOINT) == []
+    assert mock_api_fetch.call_count == 2
+
+
+def record_statuses():
+    """
+    api_fetch のレスポンスのステータスコードを記録する
+    """
+    statuses = []
+
+    def fetch(endpoint, headers=None):
+        res = api_fetch(endpoint, headers=headers)
+        statuses.append(res.status_code)
+        return res
+
+    return statuses, patch('normalize_japanese_addresses.library.regex.api_fetch', side_effect=fetch)
+
+
+@pytest.mark.parametrize("endpoint_fixture", ["local_endpoint", "http_endpoint"])
+def test_normalize_cache_0008(endpoint_fixture, request):
+    """
+    有効期間が過ぎた後は条件付きで取得し、変更がなければデータと正規表現を作り直さないことを確認
+    """
+    endpoint = request.getfixturevalue(endpoint_fixture)
+    normalizer = Normalizer(endpoint=endpoint, ttl=0)
+    statuses, mock_api_fetch = record_statuses()
+
+    with mock_api_fetch, patch(
+        'normalize_japanese_addresses.library.regex.get_town_regexes',
+        wraps=get_town_regexes,
+    ) as mock_get_town_regexes:
+        result = normalizer.normalize('大阪府堺市北区新金岡町4丁1−8')
+        assert statuses == [200, 200]
+        prefectures = get_prefectures(endpoint, normalizer.cache)
+
+        # ttl=0 のため毎回取得するが、変更がないため 304 が返りデータを使い回す
+        assert normalizer.normalize('大阪府堺市北区新金岡町4丁1−8') == result
+        assert statuses[2:] == [304] * (len(statuses) - 2)
+        assert get_prefectures(endpoint, normalizer.cache) is prefectures
+        assert mock_get_town_regexes.call_count == 1
+
+
+def test_normalize_cache_0009(local_endpoint, tmp_path):
+    """
+    ファイルが更新された場合は新しいデータを読み込むことを確認
+    """
+    shutil.copytree(local_endpoint.replace("file://", "").replace("/api/ja", "/api"), tmp_path / "api")
+    endpoint = f"file://{tmp_path}/api/ja"
+    normalizer = Normalizer(endpoint=endpoint, ttl=0)
+    assert normalizer.normalize('広島県府中市府川町315')["town"] == "府川町"
+
+    (tmp_path / "api" / "ja" / "広島県" / "府中市.json").write_text(
+        '[{"town": "府中町", "koaza": "", "lat": 1.0, "lng": 2.0}]', encoding="utf-8"
+    )
+    assert normalizer.normalize('広島県府中市府中町1')["town"] == "府中町"
+
+
+def test_normalize_cache_0010(local_endpoint, tmp_path):
+    """
+    ディスクキャッシュがあれば、新しいインスタンスでも住所データを取得しないことを確認
+    """
+    path = str(tmp_path / "cache.sqlite3")
+    result = Normalizer(endpoint=local_endpoint, disk_cache=path).normalize('大阪府堺市北区新金岡町4丁1−8')
+
+    with patch(
+        'normalize_japanese_addresses.library.regex.api_fetch', side_effect=AssertionError
+    ) as mock_api_fetch:
+        normalizer = Normalizer(endpoint=local_endpoint, disk_cache=path)
+        assert normalizer.normalize('大阪府堺市北区新金岡町4丁1−8') == result
+        assert mock_api_fetch.call_count == 0
+
+
+def test_normalize_cache_0011(local_endpoint, tmp_path):
+    """
+    ディスクキャッシュの有効期間が過ぎた後は条件付きで取得し、取得日時を更新することを確認
+    """
+    disk_cache = DiskCache(str(tmp_path / "cache.sqlite3"))
+    result = Normalizer(endpoint=local_endpoint, disk_cache=disk_cache).normalize('広島県府中市府川町315')
+    fetched_at = disk_cache.get(f"{local_endpoint}.json").fetched_at
+
+    statuses, mock_api_fetch = record_statuses()
+    with mock_api_fetch:
+        normalizer = Normalizer(endpoint=local_endpoint, ttl=0, disk_cache=disk_cache)
+        assert normalizer.normalize('広島県府中市府川町315') == result
+        assert statuses == [304, 304]
+    assert disk_cache.get(f"{local_endpoint}.json").fetched_at > fetched_at
+
+
+def normalize_with_disk_cache(endpoint: str, path: str) -> str:
+    return Normalizer(endpoint=endpoint, disk_cache=path).normalize('広島県府中市府川町315')["town"]
+
+
+def test_normalize_cache_0012(local_endpoint, tmp_path):
+    """
+    複数のプロセスから同時にディスクキャッシュを読み書きできることを確認
+    """
+    path = str(tmp_path / "cache.sqlite3")
+    with ProcessPoolExecutor(max_workers=4) as executor:
+        towns = list(executor.map(normalize_with_disk_cache, [local_endpoint] * 8, [path] * 8))
+    assert towns == ["府川町"] * 8
+
+    disk_cache = DiskCache(path)
+    assert json.loads(disk_cache.get(f"{local_endpoint}.json").text)["広島県"] == ["府中市"]
+    assert disk_cache.get(get_towns_url("広島県", "府中市", local_endpoint)) is not None
+
+
+def test_normalize_cache_0013(local_endpoint):
+    """
+    正規化した結果のキャッシュを使い、キャッシュした結果のコピーを返すことを確認
+    """
+    normalizer = Normalizer(endpoint=local_endpoint, result_cache_size=10)
+    result = normalizer.normalize('大阪府堺市北区新金岡町4丁1−8')
+    result["town"] = "書き換えた町丁目"
+
+    with patch(
+        'normalize_japanese_addresses.normalize.normalize_until_city'
+    ) as mock_normalize_until_city:
+        assert normalizer.normalize('大阪府堺市北区新金岡町4丁1−8')["town"] == "新金岡町四丁"
+        assert normalizer.normalize_many(['大阪府堺市北区新金岡町4丁1−8'])[0]["town"] == "新金岡町四丁"
+        assert mock_normalize_until_city.call_count == 0
+
+    # 正規化レベルが異なる場合はキャッシュを使わない
+    assert normalizer.normalize('大阪府堺市北区新金岡町4丁1−8', level=2)["town"] == ""
+    assert normalizer.result_cache_info() == {"hits": 2, "misses": 2, "size": 2, "maxsize": 10}
+
+    # 既定ではキャッシュしない
+    assert Normalizer(endpoint=local_endpoint).result_cache_info()["maxsize"] == 0
+
+
+def test_normalize_cache_0014(local_endpoint, tmp_path):
+    """
+    住所データの内容が変わった場合は、正規化した結果のキャッシュを使わないことを確認
+    """
+    shutil.copytree(local_endpoint.replace("file://", "").replace("/api/ja", "/api"), tmp_path / "api")
+    endpoint = f"file://{tmp_path}/api/ja"
+    normalizer = Normalizer(endpoint=endpoint, result_cache_size=10)
+    assert normalizer.normalize('広島県府中市府川町315')["lat"] == 34.566667
+
+    # 読み込み直しても内容が変わらなければキャッシュを使う
+    normalizer.cache.reset_results()
+    normalizer.cache.set_result(
+        (endpoint, '広島県府中市府川町315', 3, normalizer.cache.version), {"lat": "cached"}
+    )
+    version = normalizer.cache.version
+    normalizer.cache.towns.clear()
+    normalizer.cache.validated.clear()
+    get_towns('広島県', '府中市', endpoint, normalizer.cache)
+    assert normalizer.cache.version == version
+    assert normalizer.normalize('広島県府中市府川町315') == {"lat": "cached"}
+
+    (tmp_path / "api" / "ja" / "広島県" / "府中市.json").write_text(
+        '[{"town": "府川町", "koaza": "", "lat": 1.0, "lng": 2.0}]', encoding="utf-8"
+    )
+    normalizer.cache.towns.clear()
+    get_towns('広島県', '府中市', endpoint, normalizer.cache)
+    assert normalizer.cache.version == version + 1
+    assert normalizer.normalize('広島県府中市府川町315')["lat"] == 1.0
+
+
+def test_normalize_cache_0015(local_endpoint):
+    """
+    市区町村の索引を作成した後でも、キャッシュをクリアすると市区町村が再びキャッシュされることを確認
+    """
+    normalize('大阪府堺市北区新金岡町4丁1−8', endpoint=local_endpoint)
+
+    clear_cache_of_cities()
+    assert len(default_cache.city_regexes) == 0
+
+    assert normalize('大阪府堺市北区新金岡町4丁1−8', endpoint=local_endpoint)["town"] == "新金岡町四丁"
+    assert len(default_cache.city_regexes) != 0
+
+
+def test_normalize_cache_0016(local_endpoint):
+    """
+    市区町村の正規表現はインスタンスごとにキャッシュされ、都道府県データのリストを並べ替えないことを確認
+    """
+    normalizer = Normalizer(endpoint=local_endpoint, maxsize=2)
+    assert normalizer.normalize('北海道札幌市西区24-2-2-3-3')["town"] == "二十四軒二条二丁目"
+
+    prefectures = get_prefectures(local_endpoint, normalizer.cache)
+    assert prefectures["北海道"] == ["札幌市中央区", "札幌市西区"]
+    assert len(normalizer.cache.city_regexes) == 2
+    assert len(Normalizer(endpoint=local_endpoint).cache.city_regexes) == 0
+
+
+def test_normalize_cache_0017(local_endpoint):
+    """
+    ttl オプションごとのキャッシュの数に上限があることを確認
+    """
+    for ttl in range(1, MAX_TTL_CACHES + 3):
+        normalize('府中市宮町1-1', endpoint=local_endpoint, ttl=ttl)
+    assert len(ttl_caches) == MAX_TTL_CACHES
+
+
+# fork した子プロセスが引き継ぐディスクキャッシュ
+forked_disk_cache = None
+
+
+def connect_in_forked_process() -> bool:
+    inherited = forked_disk_cache.local.connection
+    return forked_disk_cache.connect() is not inherited and forked_disk_cache.get("url").text == "text"
+
+
+@pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(), reason="fork is not available")
+def test_normalize_cache_0018(tmp_path):
+    """
+    fork した子プロセスでは、親プロセスから引き継いだ SQLite の接続を使わずに接続し直すことを確認
+    """
+    global forked_disk_cache
+
+    forked_disk_cache = DiskCache(str(tmp_path / "cache.sqlite3"))
+    forked_disk_cache.set("url", "text")
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("fork")) as executor:
+        assert executor.submit(connect_in_forked_process).result()
+    assert forked_disk_cache.inherited_connections == []
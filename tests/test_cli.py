@@ -0,0 +1,99 @@
+import csv
+import json
+
+import pytest
+
+from normalize_japanese_addresses import normalize
+from normalize_japanese_addresses.cli import main
+
+ADDRESSES = [
+    '大阪府堺市北区新金岡町4丁1−8',
+    '和歌山県串本町串本1234',
+    '北海道札幌市西区24-2-2-3-3',
+    '府中市宮町1-1',
+    '東京都文京区千石4丁目15-7',
+    '住所ではない文字列',
+] * 3
+
+
+def test_cli_0001(local_endpoint, tmp_path, capsys):
+    """
+    CSV の住所を正規化し、入力の列に正規化した結果の列を追加して出力することを確認
+    """
+    input_path = tmp_path / "addresses.csv"
+    with open(input_path, "w", encoding="utf-8", newline="") as fp:
+        writer = csv.writer(fp)
+        writer.writerow(["id", "住所"])
+        writer.writerows([[index, address] for index, address in enumerate(ADDRESSES)])
+    output_path = tmp_path / "normalized.csv"
+
+    main([str(input_path), "-o", str(output_path), "--endpoint", local_endpoint, "--chunksize", "4"])
+
+    with open(output_path, encoding="utf-8", newline="") as fp:
+        rows = list(csv.DictReader(fp))
+    assert list(rows[0].keys()) == ["id", "住所", "pref", "city", "town", "addr", "lat", "lng", "level"]
+    assert [row["id"] for row in rows] == [str(index) for index in range(len(ADDRESSES))]
+    for row, address in zip(rows, ADDRESSES):
+        result = normalize(address, endpoint=local_endpoint)
+        assert row["town"] == result["town"]
+        assert row["lat"] == ("" if result["lat"] is None else str(result["lat"]))
+        assert row["level"] == str(result["level"])
+
+    # 同じ住所は正規化した結果を使い回す
+    assert "cache hit rate 66.7%" in capsys.readouterr().err
+
+
+def test_cli_0002(local_endpoint, tmp_path):
+    """
+    JSONL を複数プロセスで正規化しても、1プロセスの場合と同じ結果が入力順に出力されることを確認
+    """
+    input_path = tmp_path / "addresses.jsonl"
+    input_path.write_text(
+        "".join(json.dumps({"address": address}, ensure_ascii=False) + "\n" for address in ADDRESSES),
+        encoding="utf-8",
+    )
+
+    outputs = []
+    for jobs in ["1", "2"]:
+        output_path = tmp_path / f"normalized-{jobs}.jsonl"
+        main([
+            str(input_path), "-o", str(output_path), "-c", "address", "-j", jobs,
+            "--endpoint", local_endpoint, "--chunksize", "2", "--cache-size", "2", "-q",
+        ])
+        outputs.append(output_path.read_text(encoding="utf-8"))
+    assert outputs[0] == outputs[1]
+
+    rows = [json.loads(line) for line in outputs[0].splitlines()]
+    assert rows == [
+        {"address": address, **normalize(address, endpoint=local_endpoint)} for address in ADDRESSES
+    ]
+
+
+def test_cli_0003(local_endpoint, tmp_path):
+    """
+    住所の列がない場合はエラーになることを確認
+    """
+    input_path = tmp_path / "addresses.csv"
+    input_path.write_text("id,address\n1,府中市宮町1-1\n", encoding="utf-8")
+    with pytest.raises(SystemExit):
+        main([str(input_path), "--endpoint", local_endpoint])
+
+
+def test_cli_0004(local_endpoint, tmp_path, capsys):
+    """
+    --cache-size 0 では正規化した結果を使い回さずに出力し、負の値はエラーになることを確認
+    """
+    input_path = tmp_path / "addresses.csv"
+    input_path.write_text("id,住所\n1,府中市宮町1-1\n2,府中市宮町1-1\n", encoding="utf-8")
+    output_path = tmp_path / "normalized.csv"
+
+    main([str(input_path), "-o", str(output_path), "--endpoint", local_endpoint, "--cache-size", "0"])
+
+    with open(output_path, encoding="utf-8", newline="") as fp:
+        rows = list(csv.DictReader(fp))
+    assert [row["town"] for row in rows] == ["宮町一丁目", "宮町一丁目"]
+    # 同じまとまりの中の同じ住所は使い回す
+    assert "cache hit rate 50.0%" in capsys.readouterr().err
+
+    with pytest.raises(SystemExit):
+        main([str(input_path), "--endpoint", local_endpoint, "--cache-size", "-1"])
@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+
+from normalize_japanese_addresses import normalize
+from normalize_japanese_addresses.dataframe import normalize_series
+
+ADDRESSES = [
+    '大阪府堺市北区新金岡町4丁1−8',
+    '和歌山県串本町串本1234',
+    '北海道札幌市西区24-2-2-3-3',
+    '住所ではない文字列',
+]
+
+
+def test_normalize_series_0001(local_endpoint):
+    """
+    重複した住所を含む列を正規化し、型付きの列に展開することを確認
+    """
+    series = pd.Series(ADDRESSES * 3 + [None], index=range(100, 113), name="住所")
+    df = normalize_series(series, endpoint=local_endpoint)
+
+    assert list(df.columns) == ["pref", "city", "town", "addr", "lat", "lng", "level"]
+    assert list(df.index) == list(series.index)
+    assert df["lat"].dtype == np.float64
+    assert df["lng"].dtype == np.float64
+    assert df["level"].dtype == np.int8
+
+    for index, address in series.items():
+        expected = normalize(address if isinstance(address, str) else "", endpoint=local_endpoint)
+        row = df.loc[index]
+        assert [row["pref"], row["city"], row["town"], row["addr"], row["level"]] == \
+               [expected["pref"], expected["city"], expected["town"], expected["addr"], expected["level"]]
+        if expected["lat"] is None:
+            assert np.isnan(row["lat"])
+        else:
+            assert row["lat"] == expected["lat"]
+
+
+def test_normalize_series_0002(local_endpoint):
+    """
+    アクセサーから複数プロセスで正規化しても、1プロセスの場合と同じ結果になることを確認
+    """
+    series = pd.Series(ADDRESSES * 5)
+    expected = normalize_series(series, endpoint=local_endpoint, level=2)
+    result = series.address.normalize(workers=2, chunksize=2, endpoint=local_endpoint, level=2)
+    pd.testing.assert_frame_equal(result, expected)
@@ -0,0 +1,139 @@
+
+import mmap
+import shutil
+from unittest.mock import patch
+
+import pytest
+
+from normalize_japanese_addresses import normalize, Normalizer
+from normalize_japanese_addresses.build_dataset import build_dataset
+from normalize_japanese_addresses.library.dataset import Dataset, MAGIC, HEADER, decode_city
+
+ADDRESSES = [
+    '大阪府堺市北区新金岡町4丁1−8',
+    '和歌山県串本町串本1234',
+    '和歌山県東牟婁郡串本町くじ野川一二三四',
+    '北海道札幌市西区24-2-2-3-3',
+    '府中市宮町1-1',
+    '府中市府川町315',
+    '東京都文京区千石4丁目15-7',
+    '住所ではない文字列',
+]
+
+
+@pytest.fixture(scope="module")
+def dataset_path(local_endpoint, tmp_path_factory) -> str:
+    path = tmp_path_factory.mktemp("dataset") / "ja.dataset"
+    stats = build_dataset(local_endpoint, str(path))
+    assert stats["prefectures"] == 5
+    assert stats["cities"] == 8
+    assert stats["towns"] == 10
+    return str(path)
+
+
+def test_dataset_0001(local_endpoint, dataset_path):
+    """
+    住所データファイルを使った場合も、api/ja を使った場合と同じ結果になることを確認
+    """
+    endpoint = f"dataset://{dataset_path}"
+    for level in (1, 2, 3):
+        assert [normalize(address, endpoint=endpoint, level=level) for address in ADDRESSES] == \
+               [normalize(address, endpoint=local_endpoint, level=level) for address in ADDRESSES]
+
+
+def test_dataset_0002(dataset_path):
+    """
+    住所データファイルから町丁目データを復元できることを確認
+    """
+    dataset = Dataset(dataset_path)
+    assert len(dataset.version) == 16
+    assert dataset.prefectures["和歌山県"] == ["東牟婁郡串本町"]
+    assert dataset.get_towns("和歌山県", "東牟婁郡串本町")[1] == \
+           {"town": "鬮野川", "koaza": "", "lat": 33.493026, "lng": 135.784941}
+    with pytest.raises(KeyError):
+        dataset.get_towns("和歌山県", "存在しない町")
+
+
+def test_dataset_0003(dataset_path, tmp_path):
+    """
+    住所データファイルでない場合や、形式のバージョンが異なる場合はエラーになることを確認
+    """
+    with open(dataset_path, "rb") as fp:
+        data = fp.read()
+
+    invalid_path = tmp_path / "invalid.dataset"
+    invalid_path.write_bytes(b"[]" + data)
+    with pytest.raises(ValueError):
+        Dataset(str(invalid_path))
+
+    _, _, index_size = HEADER.unpack_from(data)
+    old_path = tmp_path / "old.dataset"
+    old_path.write_bytes(HEADER.pack(MAGIC, 0, index_size) + data[HEADER.size:])
+    with pytest.raises(ValueError):
+        Dataset(str(old_path))
+
+
+def test_dataset_0004(dataset_path):
+    """
+    住所データファイルをメモリマップで開き、町丁目データは参照した市区町村の分だけ復元することを確認
+    """
+    dataset = Dataset(dataset_path)
+    assert isinstance(dataset.data, mmap.mmap)
+
+    with patch('normalize_japanese_addresses.library.dataset.decode_city', wraps=decode_city) as mock_decode_city:
+        assert dataset.prefectures["広島県"] == ["府中市"]
+        assert mock_decode_city.call_count == 0
+
+        assert dataset.get_towns("広島県", "府中市")[0]["town"] == "府川町"
+        assert mock_decode_city.call_count == 1
+    dataset.close()
+
+
+def test_dataset_0005(dataset_path):
+    """
+    町丁目の照合では、市区町村のデータを1度だけ復元することを確認
+    """
+    endpoint = f"dataset://{dataset_path}"
+    normalizer = Normalizer(endpoint=endpoint)
+    with patch('normalize_japanese_addresses.library.dataset.decode_city', wraps=decode_city) as mock_decode_city:
+        assert normalizer.normalize('広島県府中市府川町315')["town"] == "府川町"
+        assert normalizer.normalize('広島県府中市府川町316')["addr"] == "316"
+        assert mock_decode_city.call_count == 1
+
+
+def test_dataset_0006(local_endpoint, tmp_path):
+    """
+    住所データファイルを作り直した場合は、開き直して新しいデータで正規化することを確認
+    """
+    shutil.copytree(local_endpoint.replace("file://", "").replace("/api/ja", "/api"), tmp_path / "api")
+    path = str(tmp_path / "ja.dataset")
+    build_dataset(str(tmp_path / "api" / "ja"), path)
+    normalizer = Normalizer(endpoint=f"dataset://{path}")
+    assert normalizer.normalize('広島県府中市府川町315')["lat"] == 34.566667
+
+    (tmp_path / "api" / "ja" / "広島県" / "府中市.json").write_text(
+        '[{"town": "府川町", "koaza": "", "lat": 1.0, "lng": 2.0}]', encoding="utf-8"
+    )
+    build_dataset(str(tmp_path / "api" / "ja"), path)
+    assert normalizer.normalize('広島県府中市府川町315')["lat"] == 1.0
+
+
+def test_dataset_0007(local_endpoint, tmp_path):
+    """
+    住所データファイルを作り直した場合は、正規化した結果のキャッシュを使わないことを確認
+    """
+    shutil.copytree(local_endpoint.replace("file://", "").replace("/api/ja", "/api"), tmp_path / "api")
+    path = str(tmp_path / "ja.dataset")
+    build_dataset(str(tmp_path / "api" / "ja"), path)
+    normalizer = Normalizer(endpoint=f"dataset://{path}", result_cache_size=100)
+    address = '広島県府中市府川町315'
+    assert normalizer.normalize(address)["lat"] == 34.566667
+    assert normalizer.normalize_many([address])[0]["lat"] == 34.566667
+    assert normalizer.result_cache_info()["hits"] == 1
+
+    (tmp_path / "api" / "ja" / "広島県" / "府中市.json").write_text(
+        '[{"town": "府川町", "koaza": "", "lat": 1.0, "lng": 2.0}]', encoding="utf-8"
+    )
+    build_dataset(str(tmp_path / "api" / "ja"), path)
+    assert normalizer.normalize(address)["lat"] == 1.0
+    assert normalizer.normalize_many([address])[0]["lat"] == 1.0
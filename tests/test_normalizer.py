@@ -0,0 +1,97 @@
+import json
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+
+from normalize_japanese_addresses import normalize, Normalizer
+from normalize_japanese_addresses.library.regex import (
+    default_cache,
+    get_cached_prefectures,
+    get_prefectures,
+    set_ttl,
+)
+
+ADDRESSES = [
+    '大阪府堺市北区新金岡町4丁1−8',
+    '和歌山県串本町串本1234',
+    '北海道札幌市西区24-2-2-3-3',
+    '府中市宮町1-1',
+    '東京都文京区千石4丁目15-7',
+    '住所ではない文字列',
+]
+
+
+def test_normalizer_0001(local_endpoint):
+    """
+    Normalizer の結果が normalize と同じになることを確認
+    """
+    normalizer = Normalizer(endpoint=local_endpoint)
+    assert [normalizer.normalize(address) for address in ADDRESSES] == \
+           [normalize(address, endpoint=local_endpoint) for address in ADDRESSES]
+    assert normalizer.normalize_many(ADDRESSES, level=2) == \
+           [normalize(address, endpoint=local_endpoint, level=2) for address in ADDRESSES]
+
+
+def test_normalizer_0002(local_endpoint, tmp_path):
+    """
+    異なる住所データを使うインスタンスを同時に利用できることを確認
+    """
+    # 堺市北区の緯度・経度だけが異なる住所データを作成する
+    shutil.copytree(local_endpoint.replace("file://", "").replace("/api/ja", "/api"), tmp_path / "api")
+    (tmp_path / "api" / "ja" / "大阪府" / "堺市北区.json").write_text(
+        json.dumps([{"town": "新金岡町四丁", "koaza": "", "lat": 1.0, "lng": 2.0}], ensure_ascii=False),
+        encoding="utf-8",
+    )
+    normalizer1 = Normalizer(endpoint=local_endpoint)
+    normalizer2 = Normalizer(endpoint=f"file://{tmp_path}/api/ja")
+
+    result1 = normalizer1.normalize('大阪府堺市北区新金岡町4丁1−8')
+    result2 = normalizer2.normalize('大阪府堺市北区新金岡町4丁1−8')
+    assert (result1["lat"], result1["lng"]) == (34.568184, 135.519409)
+    assert (result2["lat"], result2["lng"]) == (1.0, 2.0)
+    assert normalizer1.cache is not normalizer2.cache
+    assert get_cached_prefectures(normalizer2.endpoint) is None
+
+
+def test_normalizer_0003(local_endpoint):
+    """
+    ttl オプションを指定しても、既定のキャッシュが消去されないことを確認
+    """
+    set_ttl(60)
+    prefectures = get_prefectures(local_endpoint)
+
+    normalize('府中市宮町1-1', endpoint=local_endpoint, ttl=10)
+    assert get_cached_prefectures(local_endpoint) is prefectures
+    assert default_cache.ttl == 60
+
+
+def test_normalizer_0004(local_endpoint):
+    """
+    複数のスレッドから同時に利用しても、1件ずつ正規化した場合と同じ結果になることを確認
+    """
+    expected = [normalize(address, endpoint=local_endpoint) for address in ADDRESSES]
+    normalizer = Normalizer(endpoint=local_endpoint, ttl=60, maxsize=10)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(lambda _: normalizer.normalize_many(ADDRESSES), range(32)))
+    assert all(result == expected for result in results)
+
+
+def test_normalizer_0005(local_endpoint):
+    """
+    max_length を超える長さの住所は正規化せず、level 0 で返すことを確認
+    """
+    address = '大阪府堺市北区新金岡町4丁1−8' + ' ' * 100
+    expected = {"pref": "", "city": "", "town": "", "addr": address, "lat": None, "lng": None, "level": 0}
+
+    normalizer = Normalizer(endpoint=local_endpoint, max_length=100)
+    assert normalizer.normalize(address) == expected
+    assert normalizer.normalize_many([address, ADDRESSES[0]]) == [
+        expected,
+        normalize(ADDRESSES[0], endpoint=local_endpoint),
+    ]
+    assert normalize(address, endpoint=local_endpoint, max_length=100) == expected
+
+    # None の場合は長さを制限しない
+    assert normalize(address, endpoint=local_endpoint, max_length=None)["level"] == 3
+    # 既定では長さを制限しない
+    assert normalize(address + ' ' * 1000, endpoint=local_endpoint)["level"] == 3
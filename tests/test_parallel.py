@@ -0,0 +1,72 @@
+import multiprocessing
+from unittest.mock import patch
+
+import pytest
+
+from normalize_japanese_addresses import ParallelNormalizer, normalize_many
+from normalize_japanese_addresses.library.regex import get_cached_towns, get_ttl_cache
+
+ADDRESSES = [
+    '大阪府堺市北区新金岡町4丁1−8',
+    '和歌山県串本町串本1234',
+    '北海道札幌市西区24-2-2-3-3',
+    '府中市宮町1-1',
+    '東京都文京区千石4丁目15-7',
+    '住所ではない文字列',
+] * 5
+
+
+def test_parallel_normalizer_0001(local_endpoint):
+    """
+    複数プロセスで正規化しても、1プロセスで正規化した場合と同じ結果が入力順に返ることを確認
+    """
+    with ParallelNormalizer(workers=2, chunksize=4, endpoint=local_endpoint) as normalizer:
+        results = normalizer.normalize_many(ADDRESSES)
+    assert results == normalize_many(ADDRESSES, endpoint=local_endpoint)
+
+
+def test_parallel_normalizer_0002(local_endpoint):
+    """
+    住所を順に読み込みながら正規化できることを確認
+    """
+    with ParallelNormalizer(workers=2, chunksize=3, endpoint=local_endpoint, level=2) as normalizer:
+        results = normalizer.imap(iter(ADDRESSES))
+        assert next(results)["city"] == '堺市北区'
+        assert list(results) == normalize_many(ADDRESSES, endpoint=local_endpoint, level=2)[1:]
+
+
+def test_parallel_normalizer_0003(local_endpoint):
+    with ParallelNormalizer(workers=1, endpoint=local_endpoint) as normalizer:
+        assert normalizer.normalize_many([]) == []
+
+
+def test_parallel_normalizer_0004(local_endpoint):
+    """
+    ワーカープロセスが起動時に、指定した市区町村の町丁目の辞書を読み込んでいることを確認
+    """
+    with ParallelNormalizer(workers=1, endpoint=local_endpoint, prefs=['大阪府']) as normalizer:
+        towns = normalizer.executor.submit(get_cached_towns, '大阪府', '堺市北区', local_endpoint).result()
+    assert [town["town"] for town in towns] == ['新金岡町四丁']
+
+
+def test_parallel_normalizer_0005(local_endpoint):
+    """
+    prefs・cities を省略した場合は、町丁目の辞書を事前に読み込まないことを確認
+    """
+    with ParallelNormalizer(workers=1, endpoint=local_endpoint, ttl=121) as normalizer:
+        cache = get_ttl_cache(121)
+        assert cache.get("prefectures", f"{local_endpoint}.json") is not None
+        assert get_cached_towns('大阪府', '堺市北区', local_endpoint, cache) is None
+        assert normalizer.normalize_many(ADDRESSES[:1]) == normalize_many(ADDRESSES[:1], endpoint=local_endpoint)
+
+
+@pytest.mark.skipif(multiprocessing.get_start_method() != "fork", reason="fork でワーカープロセスを起動する場合だけ")
+def test_parallel_normalizer_0006(local_endpoint):
+    """
+    fork で起動したワーカープロセスは、ttl を指定した場合も親プロセスで読み込んだ辞書を取得し直さずに使うことを確認
+    """
+    expected = normalize_many(ADDRESSES[:1], endpoint=local_endpoint)
+    with ParallelNormalizer(workers=2, endpoint=local_endpoint, prefs=['大阪府'], ttl=122) as normalizer:
+        # ワーカープロセスは最初の住所を渡したときに起動するため、取得するとエラーになる
+        with patch('normalize_japanese_addresses.library.regex.api_fetch', side_effect=AssertionError):
+            assert normalizer.normalize_many(ADDRESSES[:1] * 4) == expected * 4
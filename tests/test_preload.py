@@ -0,0 +1,94 @@
+from unittest.mock import patch
+
+import pytest
+
+from normalize_japanese_addresses import Normalizer, preload
+from normalize_japanese_addresses.library.regex import get_cached_towns, get_prefectures, get_town_matcher
+
+
+def test_preload_0001(local_endpoint):
+    """
+    指定した都道府県の市区町村を読み込み、進捗と件数を返すことを確認
+    """
+    normalizer = Normalizer(endpoint=local_endpoint)
+    calls = []
+    stats = normalizer.preload(prefs=["北海道", "大阪府"], workers=4, progress=lambda *args: calls.append(args))
+
+    assert stats["prefectures"] == 2
+    assert stats["cities"] == 4
+    assert stats["towns"] == 4
+    assert stats["seconds"] >= 0
+    assert [done for done, _, _, _ in calls] == [1, 2, 3, 4]
+    assert {(pref, city) for _, total, pref, city in calls if total == 4} == {
+        ("北海道", "札幌市中央区"),
+        ("北海道", "札幌市西区"),
+        ("大阪府", "大阪市中央区"),
+        ("大阪府", "堺市北区"),
+    }
+    assert get_cached_towns("大阪府", "堺市北区", local_endpoint, normalizer.cache) is not None
+    assert get_cached_towns("東京都", "文京区", local_endpoint, normalizer.cache) is None
+
+    # 読み込んだ市区町村は取得し直さない
+    with patch(
+        'normalize_japanese_addresses.library.regex.api_fetch', side_effect=AssertionError
+    ) as mock_api_fetch:
+        assert normalizer.normalize('大阪府堺市北区新金岡町4丁1−8')["town"] == "新金岡町四丁"
+        assert mock_api_fetch.call_count == 0
+
+
+def test_preload_0002(local_endpoint):
+    """
+    市区町村を指定した場合と、存在しない都道府県・市区町村を指定した場合を確認
+    """
+    normalizer = Normalizer(endpoint=local_endpoint)
+    stats = normalizer.preload(cities=["府中市"])
+    assert (stats["prefectures"], stats["cities"]) == (2, 2)
+
+    with pytest.raises(ValueError):
+        normalizer.preload(prefs=["存在しない県"])
+    with pytest.raises(ValueError):
+        normalizer.preload(prefs=["北海道"], cities=["府中市"])
+
+
+def test_preload_0003(local_endpoint):
+    """
+    preload は normalize と同じキャッシュに読み込むことを確認
+    """
+    stats = preload(endpoint=local_endpoint)
+    assert (stats["prefectures"], stats["cities"], stats["towns"]) == (5, 8, 10)
+
+
+def test_preload_0004(local_endpoint):
+    """
+    preload で町丁目の正規表現までコンパイルすることを確認（compile_regexes=False の場合は初めて使うときまでコンパイルしない）
+    """
+    normalizer = Normalizer(endpoint=local_endpoint)
+    normalizer.preload(cities=["東牟婁郡串本町"])
+    town_regexes, _ = get_town_matcher("和歌山県", "東牟婁郡串本町", local_endpoint, normalizer.cache)
+    assert all(regex.compiled is not None for _, regex, _, _ in town_regexes)
+
+    normalizer = Normalizer(endpoint=local_endpoint)
+    normalizer.preload(cities=["東牟婁郡串本町"], compile_regexes=False)
+    town_regexes, _ = get_town_matcher("和歌山県", "東牟婁郡串本町", local_endpoint, normalizer.cache)
+    assert all(regex.compiled is None for _, regex, _, _ in town_regexes)
+
+
+def test_preload_0005(local_endpoint):
+    """
+    キャッシュの上限件数より多い市区町村を読み込んでも、読み込んだデータが追い出されないことを確認
+    """
+    normalizer = Normalizer(endpoint=local_endpoint, maxsize=2)
+    stats = normalizer.preload()
+    assert stats["cities"] == 8
+    assert normalizer.cache.maxsize >= 9
+
+    # 読み込んだ市区町村は取得し直さない
+    with patch(
+        'normalize_japanese_addresses.library.regex.api_fetch', side_effect=AssertionError
+    ) as mock_api_fetch:
+        for pref, cities in get_prefectures(local_endpoint, normalizer.cache).items():
+            for city in cities:
+                assert get_cached_towns(pref, city, local_endpoint, normalizer.cache) is not None
+        assert normalizer.preload()["cities"] == 8
+        assert normalizer.normalize('和歌山県串本町串本1234')["town"] == "串本"
+        assert mock_api_fetch.call_count == 0
@@ -0,0 +1,30 @@
+from normalize_japanese_addresses.normalize import preprocessing_address
+
+
+def test_preprocessing_address_0001():
+    assert preprocessing_address('東京都　千代田区  丸の内１ー９ー２') == '東京都千代田区丸の内1-9-2'
+    assert preprocessing_address('北海道 札幌市 西区 24-2-2-3-3') == '北海道札幌市西区24-2-2-3-3'
+    assert preprocessing_address('大阪府 堺市北区 新金岡町 4丁 1ー8') == '大阪府堺市北区新金岡町4丁1-8'
+    assert preprocessing_address('Ａｂｃ ビル') == 'Abc ビル'
+
+
+def test_preprocessing_address_0002():
+    # 数字とハイフンの組み合わせは、同じ組み合わせが他の箇所にあればその箇所も置換する
+    assert preprocessing_address('ー1ー') == '-1ー'
+    assert preprocessing_address('ー1ー 1ー') == '-1- 1-'
+    # 最初の「数字-」より前のスペースは、同じ文字列が他の箇所にあればその箇所も削除する
+    assert preprocessing_address('a 1-a 1-') == 'a1-a1-'
+
+
+def test_preprocessing_address_0003(assert_linear_time):
+    """
+    長い文字列でも、長さに比例した時間で処理できることを確認（以前は数十秒かかっていた入力）
+    """
+    for make in [
+        lambda n: '郡 ' * n + '町',
+        lambda n: 'あ ' * n,
+        lambda n: '1ー' * n,
+        lambda n: '東京 1丁目' * n,
+    ]:
+        assert_linear_time(preprocessing_address, make, 1000)
+
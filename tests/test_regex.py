@@ -0,0 +1,244 @@
+import json
+import re
+from unittest.mock import patch, MagicMock
+
+from normalize_japanese_addresses.library.regex import (
+    set_ttl,
+    get_prefecture_regex,
+    get_fold_key,
+    get_city_match_keys,
+    match_city_names,
+    jis_kanji_to_both_forms,
+    to_regex,
+    get_town_match_key,
+    get_town_matcher,
+    normalize_town_name,
+    replace_addr,
+    replace_addr_with_regexes,
+    split_addr_numbers,
+)
+
+PREFECTURES = ['北海道', '東京都', '京都府', '大阪府', '神奈川県']
+
+
+def test_get_prefecture_regex_0001():
+    match = get_prefecture_regex(PREFECTURES, False).match('京都府京都市中京区')
+    assert PREFECTURES[match.lastindex - 1] == '京都府'
+    assert match.end() == 3
+
+
+def test_get_prefecture_regex_0002():
+    assert get_prefecture_regex(PREFECTURES, False).match('神奈川横浜市') is None
+
+
+def test_get_prefecture_regex_0003():
+    match = get_prefecture_regex(PREFECTURES, True).match('神奈川横浜市')
+    assert PREFECTURES[match.lastindex - 1] == '神奈川県'
+    assert match.end() == 3
+
+
+def test_get_prefecture_regex_0004():
+    # 同じ都道府県リストに対しては同じ正規表現が再利用される
+    assert get_prefecture_regex(PREFECTURES, True) is get_prefecture_regex(list(PREFECTURES), True)
+    assert get_prefecture_regex(PREFECTURES, True) is not get_prefecture_regex(PREFECTURES, False)
+
+
+def test_get_town_match_key_0001():
+    # 同一視される文字は代表文字にまとめられる
+    assert get_town_match_key('関ケ原') == get_town_match_key('関ヶ原')
+    assert get_town_match_key('流通センター') == get_town_match_key('流通センタ-')
+    assert get_town_match_key('北桧山') == get_town_match_key('北檜山')
+
+
+def test_get_town_match_key_0002():
+    # 先頭の「大字」は省略可能なキーとして登録される
+    assert get_town_match_key('大字国納') == (get_town_match_key('国納')[0], True, True)
+    assert get_town_match_key('字梶村') == (get_town_match_key('梶村')[0], True, True)
+    assert get_town_match_key('国納')[1] is False
+
+
+def test_get_town_match_key_0003():
+    # 丁目の番号部分や複数文字の表記揺れ以降はキーに含めない
+    assert get_town_match_key('西五反田二丁目')[0] == get_town_match_key('西五反田')[0]
+    assert get_town_match_key('中央通り')[0] == get_town_match_key('中央')[0]
+    assert get_town_match_key('三栄町')[0] == ''
+
+
+def test_get_town_match_key_0004():
+    # キー全体を文字単位で照合できる場合のみ、正規表現を使わずに判定する
+    assert get_town_match_key('関ケ原')[2] is True
+    assert get_town_match_key('西五反田二丁目')[2] is False
+    assert get_town_match_key('中央通り')[2] is False
+    assert get_town_match_key('大字本郷字東')[2] is False
+
+
+@patch('normalize_japanese_addresses.library.regex.api_fetch')
+def test_normalize_town_name_0001(mock_api_fetch):
+    """
+    トライ木で候補を絞り込んでも、全ての正規表現を順に照合した場合と同じ結果になることを確認
+    """
+    towns = [
+        {"town": "本町一丁目", "koaza": "", "lat": 1.0, "lng": 1.0},
+        {"town": "本町", "koaza": "", "lat": 2.0, "lng": 2.0},
+        {"town": "大字本郷", "koaza": "", "lat": 3.0, "lng": 3.0},
+        {"town": "関ケ原", "koaza": "", "lat": 4.0, "lng": 4.0},
+        {"town": "流通センター", "koaza": "", "lat": 5.0, "lng": 5.0},
+        {"town": "中央通り", "koaza": "", "lat": 6.0, "lng": 6.0},
+        {"town": "西町", "koaza": "", "lat": 7.0, "lng": 7.0},
+    ]
+    mock_response = MagicMock()
+    mock_response.text = json.dumps(towns, ensure_ascii=False)
+    mock_api_fetch.return_value = mock_response
+
+    set_ttl(60)
+
+    endpoint = 'https://example.com/api/ja'
+    town_regexes, _ = get_town_matcher('東京都', '試験市', endpoint)
+
+    def normalize_town_name_by_regexes(addr):
+        for town, regex, lat, lng in town_regexes:
+            match = regex.match(addr)
+            if match:
+                return {"town": town, "addr": addr[len(match.group()) :], "lat": lat, "lng": lng}
+        return None
+
+    for addr in [
+        '本町1丁目2-3', '本町一丁目2', '本町2-3', '字本郷10', '本郷10', '関ヶ原1701',
+        '流通センタ-1', '中央とおり3', '西1-2', '西町1-2', '東町1',
+    ]:
+        assert normalize_town_name(addr, '東京都', '試験市', endpoint) == \
+               normalize_town_name_by_regexes(addr)
+
+
+@patch('normalize_japanese_addresses.library.regex.api_fetch')
+def test_normalize_town_name_0002(mock_api_fetch):
+    """
+    京都の通り名を読み飛ばしても、町丁目の正規表現の前に「.*」を付けて順に照合した場合と同じ結果になることを確認
+    """
+    towns = [
+        {"town": "上本能寺前町", "koaza": "", "lat": 1.0, "lng": 1.0},
+        {"town": "本能寺町", "koaza": "", "lat": 2.0, "lng": 2.0},
+        {"town": "三条通", "koaza": "", "lat": 3.0, "lng": 3.0},
+        {"town": "西ノ京小堀町", "koaza": "", "lat": 4.0, "lng": 4.0},
+        {"town": "大字上鳥羽", "koaza": "", "lat": 5.0, "lng": 5.0},
+        {"town": "御池之町", "koaza": "", "lat": 6.0, "lng": 6.0},
+    ]
+    mock_response = MagicMock()
+    mock_response.text = json.dumps(towns, ensure_ascii=False)
+    mock_api_fetch.return_value = mock_response
+
+    set_ttl(60)
+
+    endpoint = 'https://example.com/api/ja'
+    town_regexes, _ = get_town_matcher('京都府', '京都市試験区', endpoint)
+
+    def normalize_town_name_by_regexes(addr):
+        for town, regex, lat, lng in town_regexes:
+            match = regex.match(addr)
+            if match:
+                return {"town": town, "addr": addr[len(match.group()) :], "lat": lat, "lng": lng}
+        for town, regex, lat, lng in town_regexes:
+            match = re.match(f".*{regex.pattern}", addr)
+            if match:
+                return {
+                    "town": town,
+                    "addr": regex.search(match.group()).group()
+                    if len(addr) == len(match.group())
+                    else addr[len(match.group()) :],
+                    "lat": lat,
+                    "lng": lng,
+                }
+        return None
+
+    assert normalize_town_name('寺町通御池上る上本能寺前町488', '京都府', '京都市試験区', endpoint) == \
+           {"town": {"town": "上本能寺前町"}, "addr": "488", "lat": 1.0, "lng": 1.0}
+
+    for addr in [
+        '寺町通御池上る上本能寺前町488', '寺町通御池上ル本能寺町', '本能寺町寺町通上る上本能寺前町1',
+        '西大路通三条下ル西ノ京小堀町2-3', '三条通寺町西入ル', '鴨川通上鳥羽3', '字上鳥羽1', '御池通御池ノ町',
+        '河原町通り二条下る', '', '寺町通御池上る\n上本能寺前町488', '寺町通\n本能寺町', '寺町通上る本能寺町\n上本能寺前町1',
+    ]:
+        assert normalize_town_name(addr, '京都府', '京都市試験区', endpoint) == \
+               normalize_town_name_by_regexes(addr.strip())
+
+    # 「.*」と同じく、改行より後ろから始まる町丁目は照合しない
+    assert normalize_town_name('寺町通御池上る\n上本能寺前町488', '京都府', '京都市試験区', endpoint) is None
+    assert normalize_town_name('寺町通\n本能寺町', '京都府', '京都市試験区', endpoint) is None
+
+
+def test_get_city_match_keys_0001():
+    # 町村は郡名を省略したキーも登録される
+    assert get_city_match_keys('東牟婁郡串本町') == \
+           ([get_fold_key('東牟婁郡串本町'), get_fold_key('串本町')], True)
+    assert get_city_match_keys('府中市') == ([get_fold_key('府中市')], True)
+
+
+def test_match_city_names_0001():
+    prefectures = {
+        '東京都': ['府中市', '八王子市'],
+        '和歌山県': ['東牟婁郡串本町', '和歌山市'],
+        '広島県': ['府中市', '広島市中区'],
+    }
+    endpoint = 'https://example.com/api/ja/candidates'
+
+    assert match_city_names('府中市宮町1', prefectures, endpoint) == \
+           [('東京都', '府中市', 3), ('広島県', '府中市', 3)]
+    assert match_city_names('府中巿宮町1', prefectures, endpoint, '広島県') == [('広島県', '府中市', 3)]
+    assert match_city_names('串本町串本1234', prefectures, endpoint) == [('和歌山県', '東牟婁郡串本町', 3)]
+    assert match_city_names('東牟婁郡串本町串本1234', prefectures, endpoint) == \
+           [('和歌山県', '東牟婁郡串本町', 7)]
+    assert match_city_names('大阪市北区', prefectures, endpoint) == []
+
+
+def test_jis_kanji_to_both_forms_0001():
+    assert jis_kanji_to_both_forms('北檜山区') == '北(檜|桧)山(區|区)'
+    assert jis_kanji_to_both_forms('弁天町') == '(瓣|(辯|(辨|弁)))天町'
+
+
+def test_to_regex_0001():
+    assert to_regex('関ケ原') == '(關|関)([ヶケが])原'
+    assert to_regex('中央通り') == '中央(通り|とおり)'
+    assert to_regex('本ノ木') == '本([之ノの])木'
+
+
+def test_replace_addr_0001():
+    """
+    番地・号を1度の走査で変換する形式
+    """
+    assert replace_addr('1-8') == '1-8'
+    assert replace_addr('-3-3') == '3-3'
+    assert replace_addr('4番26号') == '4-26'
+    assert replace_addr('12番地1-5') == '12-1-5'
+    assert replace_addr('260番') == '260'
+    assert replace_addr('三番地四') == '3-4'
+    assert replace_addr('一の二') == '1-2'
+    assert replace_addr('二十三－四') == '23-4'
+    assert replace_addr('1－2ー3') == '1-2-3'
+    assert replace_addr('十二') == '12'
+
+
+def test_replace_addr_0002():
+    """
+    1度の走査で変換できない形式は正規表現で変換し、どちらの場合も結果が同じになることを確認
+    """
+    assert split_addr_numbers('1番2号 A棟') is None
+    assert replace_addr('1番2号 A棟') == '1-2 A棟'
+    assert replace_addr('31番以下未定') == '31以下未定'
+    assert replace_addr('1-56マルゲンビル3F') == '1-56マルゲンビル3F'
+    assert replace_addr('3丁目5') == '三丁目5'
+    assert replace_addr('1番2番3') == '1-23'
+    assert replace_addr('') == ''
+
+    for addr in ['1-8', '-3-3', '4番26号', '12番地1-5', '260番', '三番地四', '一の二', '二十三－四', '1－2ー3', '十二']:
+        assert split_addr_numbers(addr) is not None
+        assert replace_addr(addr) == replace_addr_with_regexes(addr)
+
+
+def test_replace_addr_0003(assert_linear_time):
+    """
+    長い数字の並びでも、長さに比例した時間で処理できることを確認
+    """
+    assert replace_addr('1' * 20000 + 'x') == '1' * 20000 + 'x'
+    assert replace_addr('一' * 20000 + '番x') == '一' * 20000 + 'x'
+    assert_linear_time(replace_addr, lambda n: '1' * n + 'x', 2000)
+    assert_linear_time(replace_addr, lambda n: '一' * n + '番x', 2000)
@@ -0,0 +1,18 @@
+from normalize_japanese_addresses.library.trie import build_trie, search_prefixes
+
+
+def test_search_prefixes_0001():
+    trie = build_trie([('本町', 0), ('本町通', 1), ('元町', 2), ('', 3)])
+    assert search_prefixes(trie, '本町通一丁目') == [(0, 3), (2, 0), (3, 1)]
+
+
+def test_search_prefixes_0002():
+    trie = build_trie([('本町', 0), ('本町', 1)])
+    assert search_prefixes(trie, '本町') == [(2, 0), (2, 1)]
+    assert search_prefixes(trie, '本') == []
+
+
+def test_search_prefixes_0003():
+    trie = build_trie([('本町', 0)])
+    assert search_prefixes(trie, '字本町', 1) == [(3, 0)]
+    assert search_prefixes(trie, '字本町', 0) == []
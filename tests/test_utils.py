@@ -1,4 +1,4 @@
-from normalize_japanese_addresses.library.utils import kan2num, find_kanji_numbers
+from normalize_japanese_addresses.library.utils import kan2num, find_kanji_numbers, parse_kanji_number
 
 
 def test_kan2num_0001():
@@ -87,3 +87,26 @@ def test_find_kanji_numbers_0001():
 
 def test_find_kanji_numbers_0002():
     assert find_kanji_numbers('五百三十七の1') == ['五百三十七']
+
+
+def test_find_kanji_numbers_0003():
+    assert find_kanji_numbers('万二') == ['二']
+
+
+def test_find_kanji_numbers_0004():
+    assert find_kanji_numbers('1-2') == []
+
+
+def test_parse_kanji_number_0001():
+    assert parse_kanji_number('千二百三十四') == 1234
+    assert parse_kanji_number('一千百十一万') == 11110000
+    assert parse_kanji_number('三億八') == 300000008
+    assert parse_kanji_number('十') == 10
+
+
+def test_parse_kanji_number_0002():
+    # 規則どおりでない表記は扱わない（kan2num では位取りの表記として変換する）
+    assert parse_kanji_number('千二三四') is None
+    assert parse_kanji_number('十百') is None
+    assert parse_kanji_number('万') is None
+    assert parse_kanji_number('三〇八') is None